@@ -1,16 +1,17 @@
 '''GRASP execution function (construction and LS calls)'''
-import copy
-
 from constructives import biased_randomized
+from local_search import pareto_local_search
 from local_search import variable_neighborhood_descent
-from structure.solution import Solution
+from structure.solution_cache import SolutionCache
 
+from utils.deadline import Deadline
 from utils.logger import load_logger
 
 logging = load_logger(__name__)
 
 
-def execute(inst: dict, config: dict, objective: int, iteration: int) -> Solution:
+def execute(inst: dict, config: dict, objective: int, iteration: int,
+            stats: dict = None, deadline: Deadline = None, cache: SolutionCache = None) -> tuple:
     '''The function executes a GRASP algorithm with a specified number of iterations and a given
     beta value, selecting the best solution found during the iterations.
 
@@ -22,9 +23,15 @@ def execute(inst: dict, config: dict, objective: int, iteration: int) -> Solutio
       config (dict): contains the construction and local search strategies defined by the user in
     the config file.
       objective (int): ID of the objective considered for this iteration. {0: MaxSum, 1: MaxMin}.
+      stats (dict): optional counter where the local search statistics are accumulated.
+      deadline (Deadline): optional time limit of the execution, passed to the local search.
+      cache (SolutionCache): optional memo of the local optima of previous starting solutions, so
+    a repeated construction skips the local search (not used by the 'PLS' strategy).
 
     Returns:
-        (Solution): the solution found.
+        (tuple): the SolutionSnapshot list of the construction phase, and the same list with the
+    first and last snapshots replaced by their locally improved solutions (or, with the 'PLS'
+    strategy, the non-dominated solutions found by the Pareto Local Search from all of them).
     '''
     # Get config parameters
     parameters = config.get('parameters')
@@ -42,17 +49,36 @@ def execute(inst: dict, config: dict, objective: int, iteration: int) -> Solutio
     elif iteration % 4 in {2, 3}:
         solution_list = biased_randomized.deconstruct(inst, config, objective)
 
-    c_sol_list = copy.deepcopy(solution_list)
+    # Snapshots are immutable, so the construction list is shared instead of copied
+    c_sol_list = solution_list
+    solution_list = list(c_sol_list)
+
+    # Pareto Local Search phase over the archive of all the constructed solutions
+    if ls_strategy == 'PLS':
+        solution_list = pareto_local_search.improve(solution_list, config, stats, deadline)
+        return c_sol_list, solution_list
 
     # Local Search phase
     if len(solution_list) > 1:
-        ls_sols = [0, -1]
+        ls_sols = [0, len(solution_list) - 1]
     elif len(solution_list) == 1:
         ls_sols = [0]
 
-    for sol in [solution_list[i] for i in ls_sols]:  # Apply LS only to 1st and last solutions
-        if len(sol.solution_set) > 0:  # Ensure a solution is constructed
-            variable_neighborhood_descent.improve(sol, config)
+    for i in ls_sols:  # Apply LS only to 1st and last solutions
+        if len(solution_list[i].nodes) > 0:  # Ensure a solution is constructed
+            start = solution_list[i]
+            improved = cache.get(start) if cache is not None else None
+            if cache is not None and stats is not None:
+                key = 'ls_cache_hits' if improved is not None else 'ls_cache_misses'
+                stats[key] = stats.get(key, 0) + 1
+            if improved is None:
+                sol = start.to_solution()
+                completed = variable_neighborhood_descent.improve(sol, config, stats, deadline)
+                improved = sol.snapshot()
+                # Only local optima are memoized, not the solutions of interrupted searches
+                if cache is not None and completed:
+                    cache.put(start, improved)
+            solution_list[i] = improved
 
     # c_sol_list = [c_sol_list[i] for i in [0, -1]]
     # solution_list = [solution_list[i] for i in [0, -1]]
@@ -1,8 +1,10 @@
 '''Auxiliar functions to construct a Biased-Randomized solution'''
-import copy
 import math
 import random
 
+import numpy as np
+
+from structure.archive import ParetoArchive
 from structure.solution import Solution
 
 from utils.logger import load_logger
@@ -13,7 +15,7 @@ OBJECTIVE_FUNCTIONS = {0: 'MaxSum',
                        1: 'MaxMin'}
 
 
-def construct(inst: dict, config: dict, objective: int) -> Solution:
+def construct(inst: dict, config: dict, objective: int) -> list:
     '''The function constructs a solution for a given instance using a Biased Greedy Randomized
     Adaptive Search (B-GRASP) procedure with specified parameters.
 
@@ -32,19 +34,22 @@ def construct(inst: dict, config: dict, objective: int) -> Solution:
       objective (int): ID of the objective considered for this iteration. {0: MaxSum, 1: MaxMin}.
 
     Returns:
-        (Solution): contains the solution information.
+        (list of SolutionSnapshot): snapshots of the feasible partial solutions, in the order they
+    were reached.
     '''
     # Get config parammeters
     mo_construction_approach = config.get('mo_approach_C')
     distribution = config.get('parameters').get('distribution')
 
     solution_list = []
+    # Keep only the non-dominated solutions of this construction if it is enabled
+    archive = ParetoArchive() if config.get('nd_construction') else None
 
     sol = Solution(inst)  # Initialize solution
     n = inst['n']
     u = random.randint(0, n-1)  # Select first node
     sol.add_to_solution(u)
-    cl = create_candidate_list(sol, u)
+    cl = CandidateList(sol, u)
     while sol.satisfies_cost() and len(cl) > 0:
         # If the approach is to alternate objectives IN each construction,
         # switch objective in each iteration, else maintain the (input) objective
@@ -53,13 +58,13 @@ def construct(inst: dict, config: dict, objective: int) -> Solution:
             objective = len(cl) % 2  # 0: MaxSum, 1: MaxMin
 
         # Filter only nodes that provide a feasible solution
-        cl = [c for c in cl if sol.satisfies_cost([c[2]])]
+        cl.keep(sol.total_cost + cl.cost < inst['K'])
         if len(cl) == 0:  # If the cost won't be met with any new element
             # logging.error('No feasible solution reached in the construction phase.')
             # sol = Solution(inst)
             # sol.of_MaxMin = 0
             break
-        cl.sort(key=lambda row: -row[objective])
+        cl.sort(objective, descending=True)
         print('Sorted biased candidate list with %s objective.', OBJECTIVE_FUNCTIONS.get(objective))
 
         # Biased Randomization to select new node to add to solution
@@ -72,26 +77,31 @@ def construct(inst: dict, config: dict, objective: int) -> Solution:
             selIdx = int(len(cl) * (1 - math.sqrt(random.random())))
 
         # Add selected node to solution
-        cSel = cl[selIdx]
-        sol.add_to_solution(cSel[2], cSel[1], cSel[0])
-        cl.remove(cSel)
-        update_candidate_list(sol, cl, added=cSel[2])
+        d_sum, d_min, cSel = cl.pop(selIdx)
+        sol.add_to_solution(cSel, d_min, d_sum)
+        cl.update(sol, added=cSel)
 
         # If solution is feasible, save it in the solution list
         if sol.satisfies_capacity() and sol.satisfies_cost():
-            solution_list.append(copy.deepcopy(sol))
+            if archive is None:
+                solution_list.append(sol.snapshot())
+            elif not archive.is_dominated(sol.of_MaxSum, sol.of_MaxMin):
+                archive.add(sol.snapshot())
+
+    if archive is not None:  # Sorted by MaxSum, which grows as nodes are added
+        solution_list = list(archive)
 
     # Check if any feasible solution is constructed
     if len(solution_list) == 0:
         logging.error('No feasible solution reached in the construction phase.')
         sol = Solution(inst)
         sol.of_MaxMin = 0
-        solution_list.append(sol)
+        solution_list.append(sol.snapshot())
 
     return solution_list
 
 
-def deconstruct(inst: dict, config: dict, objective: int) -> Solution:
+def deconstruct(inst: dict, config: dict, objective: int) -> list:
     '''The function constructs a solution for a given instance using a Biased Greedy Randomized
     Adaptive Search (B-GRASP) procedure with specified parameters.
 
@@ -110,20 +120,23 @@ def deconstruct(inst: dict, config: dict, objective: int) -> Solution:
       objective (int): ID of the objective considered for this iteration. {0: MaxSum, 1: MaxMin}.
 
     Returns:
-        (Solution): contains the solution information.
+        (list of SolutionSnapshot): snapshots of the feasible partial solutions, in the order they
+    were reached.
     '''
     # Get config parammeters
     mo_construction_approach = config.get('mo_approach_C')
     distribution = config.get('parameters').get('distribution')
 
     solution_list = []
+    # Keep only the non-dominated solutions of this construction if it is enabled
+    archive = ParetoArchive() if config.get('nd_construction') else None
 
     sol = Solution(inst)  # Initialize solution
     n = inst['n']
     # Generate initial solution set with all the nodes
     for u in range(n):
         sol.add_to_solution(u)
-    cl = create_candidate_list(sol)
+    cl = CandidateList(sol)
     while sol.satisfies_capacity() and len(cl) > 0:
         # If the approach is to alternate objectives IN each construction,
         # switch objective in each iteration, else maintain the (input) objective
@@ -132,13 +145,13 @@ def deconstruct(inst: dict, config: dict, objective: int) -> Solution:
             objective = len(cl) % 2  # 0: MaxSum, 1: MaxMin
 
         # Filter only nodes that provide a feasible solution
-        cl = [c for c in cl if sol.satisfies_capacity(v=[c[2]])]
+        cl.keep(sol.total_capacity - cl.capacity > inst['B'])
         if len(cl) == 0:  # If the capacity won't be met with any new element
             # logging.error('No feasible solution reached in the construction phase.')
             # sol = Solution(inst)
             # sol.of_MaxMin = 0
             break
-        cl.sort(key=lambda row: row[objective])
+        cl.sort(objective, descending=False)
         print('Sorted biased candidate list with %s objective.', OBJECTIVE_FUNCTIONS.get(objective))
 
         # Biased Randomization to select new node to add to solution
@@ -150,22 +163,27 @@ def deconstruct(inst: dict, config: dict, objective: int) -> Solution:
         elif distribution == 'Triangular':
             selIdx = int(len(cl) * (1 - math.sqrt(random.random())))
 
-        # Add selected node to solution
-        cSel = cl[selIdx]
-        sol.remove_from_solution(cSel[2], cSel[1], cSel[0])
-        cl.remove(cSel)
-        update_candidate_list(sol, cl, removed=cSel[2])
+        # Remove selected node from solution
+        d_sum, d_min, cSel = cl.pop(selIdx)
+        sol.remove_from_solution(cSel, d_min, d_sum)
+        cl.update(sol, removed=cSel)
 
         # If solution is feasible, save it in the solution list
         if sol.satisfies_capacity() and sol.satisfies_cost():
-            solution_list.append(copy.deepcopy(sol))
+            if archive is None:
+                solution_list.append(sol.snapshot())
+            elif not archive.is_dominated(sol.of_MaxSum, sol.of_MaxMin):
+                archive.add(sol.snapshot())
+
+    if archive is not None:  # Sorted by MaxSum, reversed to follow the removal order
+        solution_list = list(reversed(archive.solutions))
 
     # Check if any feasible solution is constructed
     if len(solution_list) == 0:
         logging.error('No feasible solution reached in the construction phase.')
         sol = Solution(inst)
         sol.of_MaxMin = 0
-        solution_list.append(sol)
+        solution_list.append(sol.snapshot())
 
     return solution_list
 
@@ -185,49 +203,88 @@ def create_candidate_list(sol: Solution, first: int = -1) -> list:
     of the candidate solution. It defaults to -1 when the objective values of every candidates
     need to be calculated.
     '''
-    n = sol.instance['n']
-    cl = []
-    for c in range(n):
-        if c != first:
-            d_sum = sol.distance_sum_to_solution(c)
-            d_min = sol.minimum_distance_to_solution(c)
-            cl.append([d_sum, d_min, c])
-    return cl
-
-
-def update_candidate_list(sol: Solution, cl: list, added: int = -1, removed: int = -1):
-    '''Iterates through a candidate list and updates the first (sum of distances) and second
-    (minimum distance) elements of each candidate adding the distance to the new `added` element.
-
-    Args:
-      sol (Solution): contains the solution information.
-      cl (list): a list of candidate solutions. Each candidate solution is represented as a list
-    containing the sum of the distances and the minimum distance to the rest of the nodes in the
-    solution, and the index of the candidate solution.
-      added (int): represents the ID of the candidate that was added to the solution. Defaults to
-    -1 when no candidate is added.
-      removed (int): represents the ID of the candidate that was removed from the solution.
-    Defaults to -1 when no candidate is removed.
-    '''
-    for i in range(len(cl)):
-        c = cl[i]
-
+    cl = CandidateList(sol, first)
+    return [list(c) for c in zip(cl.sum.tolist(), cl.min.tolist(), cl.node.tolist())]
+
+
+class CandidateList:
+    '''Candidate list held as parallel NumPy arrays with the sum of the distances (`sum`) and the
+    minimum distance (`min`) from each candidate node (`node`) to the solution, and its cost
+    (`cost`) and capacity (`capacity`). Filtering, sorting and updating the candidates after an
+    insertion or removal are array operations.'''
+    def __init__(self, sol: Solution, first: int = -1):
+        '''Initialize CandidateList with every node except `first`'''
+        node = np.arange(sol.instance['n'])
+        if first != -1:
+            node = node[node != first]
+        self.node = node
+        self.sum = np.round(sol.sum_to[node], 2)
+        self.min = np.round(sol.min_to[node], 2)
+        self.cost = np.asarray(sol.instance['a'])[node]
+        self.capacity = np.asarray(sol.instance['c'])[node]
+
+    def __len__(self) -> int:
+        return len(self.node)
+
+    def keep(self, mask: np.ndarray):
+        '''Keeps only the candidates marked in `mask`, preserving their order.
+
+        Args:
+          mask (np.ndarray): boolean vector with the candidates to keep.
+        '''
+        self._reorder(np.flatnonzero(mask))
+
+    def sort(self, objective: int, descending: bool):
+        '''Sorts the candidates (stably) by the objective function value in `objective`.
+
+        Args:
+          objective (int): ID of the objective used to sort the candidates. {0: MaxSum, 1: MaxMin}.
+          descending (bool): whether the candidates are sorted from the highest to the lowest value.
+        '''
+        values = self.sum if objective == 0 else self.min
+        self._reorder(np.argsort(-values if descending else values, kind='stable'))
+
+    def pop(self, i: int) -> tuple:
+        '''Removes the candidate in position `i` from the list.
+
+        Args:
+          i (int): position of the candidate in the list.
+
+        Returns:
+          (tuple): sum of the distances and minimum distance to the solution, and ID of the node.
+        '''
+        candidate = (float(self.sum[i]), float(self.min[i]), int(self.node[i]))
+        self._reorder(np.delete(np.arange(len(self.node)), i))
+        return candidate
+
+    def update(self, sol: Solution, added: int = -1, removed: int = -1):
+        '''Updates the sum of the distances and the minimum distance of every candidate with the
+        distances to the `added` or `removed` node.
+
+        Args:
+          sol (Solution): contains the solution information, already updated with the change.
+          added (int): represents the ID of the candidate that was added to the solution. Defaults
+        to -1 when no candidate is added.
+          removed (int): represents the ID of the candidate that was removed from the solution.
+        Defaults to -1 when no candidate is removed.
+        '''
         if added != -1:
-            c_to_added_distance = sol.instance['d'][added][c[2]]
-
-            # Update MaxSum objective value
-            c[0] += c_to_added_distance
-            # Update MaxMin objective value
-            # If the distance to the added is lower than current MaxMin
-            if c_to_added_distance < c[1]:
-                c[1] = c_to_added_distance
+            distances = np.asarray(sol.instance['d'][added, self.node], dtype=np.float64)
+            self.sum += distances
+            np.minimum(self.min, distances, out=self.min)
 
         if removed != -1:
-            c_to_removed_distance = sol.instance['d'][removed][c[2]]
-
-            # Update MaxSum objective value
-            c[0] -= c_to_removed_distance
-            # Update MaxMin objective value
-            # If the distance to the removed is equal to current MaxMin
-            if c_to_removed_distance == c[1]:
-                c[1] = sol.minimum_distance_to_solution(c[2])
+            distances = np.asarray(sol.instance['d'][removed, self.node], dtype=np.float64)
+            self.sum -= distances
+            # If the distance to the removed node was the minimum one, take the new minimum
+            # distance kept by the solution
+            closest = self.min == distances
+            self.min[closest] = np.round(sol.min_to[self.node[closest]], 2)
+
+    def _reorder(self, order: np.ndarray):
+        '''Selects and reorders the candidates by their positions in `order`.'''
+        self.node = self.node[order]
+        self.sum = self.sum[order]
+        self.min = self.min[order]
+        self.cost = self.cost[order]
+        self.capacity = self.capacity[order]
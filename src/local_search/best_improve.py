@@ -2,16 +2,19 @@
 Auxiliar function to apply Best Improve Local Search.
 Objective functions selected and unselected elements are compared iteratively. All the
 neighborhood is explored, and the exchange between elements (selected-unselected) that
-offers the best improvement is performed.
+offers the best improvement is performed. The non-dominated improving exchanges of the
+neighborhood are also returned, so the search can branch from several neighbours.
 '''
-import datetime
-from itertools import combinations
+import numpy as np
 
 from constructives.biased_randomized import create_candidate_list
-from structure.dominance import exchange_is_dominant
-from structure.instance import get_all_pairwise_distances
+from local_search.swap_evaluation import (BIG, SwapEvaluation, combination_distances,
+                                          combine_contributions, is_any_of,
+                                          minimum_distances_without, score_combinations)
+from structure.dominance import exchange_is_dominant, get_nondominated_solutions
 from structure.solution import Solution
 
+from utils.deadline import Deadline
 from utils.logger import load_logger
 
 logging = load_logger(__name__)
@@ -20,7 +23,7 @@ logging = load_logger(__name__)
 # TODO IMPLEMENT ALT LOCAL SEARCH STRATEGY
 
 def try_improvement(sol: Solution, objective: int = 0,
-                    switch: list = [1, 1], max_time: int = 5) -> bool:
+                    switch: list = [1, 1], deadline: Deadline = None) -> bool:
     '''Attempts to improve a solution by selecting and interchanging a selected element (node)
     with an unselected element. The improvement is obtained if the new solution dominates the
     previous solution.
@@ -33,8 +36,8 @@ def try_improvement(sol: Solution, objective: int = 0,
     element defines how many nodes will be removed from the solution and the second element
     determines the number of nodes that will be added to the solution. Defaults to [1, 1] for
     a standard 1-1 exchange.
-      max_time (int): maximum local search execution time in seconds. If no improvement is find
-    in this time, the local search is stopped.
+      deadline (Deadline): optional time limit. When it expires, the exploration stops and the
+    best exchange found so far is considered.
 
     Returns:
       (bool): `True` if the improvement was successful (i.e., if the objective values are
@@ -43,7 +46,7 @@ def try_improvement(sol: Solution, objective: int = 0,
     (worst_selected,
      sel_maxsum_variability, sel_maxmin,
      best_unselected,
-     unsel_maxsum_variability, unsel_maxmin) = select_exchange(sol, objective, switch, max_time)
+     unsel_maxsum_variability, unsel_maxmin), _ = select_exchange(sol, objective, switch, deadline)
 
     # Make exchange if new solution dominates old solution
     new_dominates_old = exchange_is_dominant(sel_maxsum_variability, sel_maxmin,
@@ -57,84 +60,219 @@ def try_improvement(sol: Solution, objective: int = 0,
     return False
 
 
-def select_exchange(sol: Solution, objective: int, switch: list, max_time: int = 5):
-    '''Interchanges the worst element in solution (lowest sum of distances to the rest of the
-    selected elements) with the best unselected element (highest sum of distances to the rest
-    of the selected elements).
+def select_exchange(sol: Solution, objective: int, switch: list, deadline: Deadline = None):
+    '''Evaluates the whole neighborhood and selects the best improving exchange, that is, the
+    exchange that leads to the solution with the highest MaxSum value (with ties broken by the
+    highest MaxMin value) among the non-dominated improving exchanges.
 
     Args:
       sol (Solution): contains the solution information.
+      objective (int): the objective function by which the selected and unselected nodes are
+    sorted.
       switch (list): indicates the neighborhood being analized in the local search. The
     first element defines how many nodes will be removed from the solution and the second
     element determines the number of nodes that will be added to the solution.
+      deadline (Deadline): optional time limit of the exploration.
 
     Returns:
-      sel (int): worst selected element ID.
-      best_sum_sel (float): sum of distances from `sel` to the rest of the elements in solution.
-      best_min_sel (float): minimum distance from `sel` to the rest of the elements in solution.
-      unsel (int): best unselected element ID.
-      best_sum_unsel (float): sum of distances from `unsel` to the rest of the elements in
-    solution.
-      best_min_unsel (float): minimum distance from `unsel` to the rest of the elements in
-    solution.
+      move (tuple): the selected exchange, with the worst selected element IDs `sel`, the sum and
+    minimum distances from `sel` to the rest of the elements in solution, the best unselected
+    element IDs `unsel`, and the sum and minimum distances from `unsel` to the rest of the
+    elements in solution.
+      moves (MoveSet): the non-dominated improving exchanges of the neighborhood, so the search
+    can continue from any of them.
+    '''
+    moves = improving_moves(sol, objective, switch, deadline)
+    if len(moves) == 0:
+        return (-1, BIG, BIG, -1, 0, 0), moves
+
+    moves = moves.nondominated()
+    best = np.lexsort((moves.new_min, moves.new_sum))[-1]
+    return moves.move(best), moves
+
+
+def improving_moves(sol: Solution, objective: int, switch: list, deadline: Deadline = None,
+                    only_improving: bool = True) -> 'MoveSet':
+    '''Evaluates every exchange of a neighborhood and keeps the ones that meet the constraints and
+    whose unselected elements dominate the selected elements. The unselected combinations are
+    built once, and each combination of selected elements is evaluated against all of them with
+    array operations.
+
+    Args:
+      sol (Solution): contains the solution information.
+      objective (int): the objective function by which the selected and unselected nodes are
+    sorted.
+      switch (list): indicates the neighborhood being analized in the local search.
+      deadline (Deadline): optional time limit. When it expires, the exploration stops and only
+    the exchanges evaluated so far are considered.
+      only_improving (bool): if `False`, every feasible exchange is considered (e.g. to find the
+    neighbours that are not dominated by an archive), and only the exchanges leading to
+    non-dominated solutions are kept.
+
+    Returns:
+      (MoveSet): the improving (or non-dominated) exchanges.
     '''
     selected, unselected = create_selected_unselected(sol, objective)
-    # Select the first combination of size switch[0] in current solution and the first combination
-    # of size switch[1] in unselected candidate list whose exchange makes a dominant new solution
-    # that mets the constraints.
-    selected_combinations = list(combinations(selected, switch[0]))
-    unselected_combinations = list(combinations(unselected, switch[1]))
-
-    sel = -1
-    best_sum_sel = 0x3f3f3f3f
-    best_min_sel = 0x3f3f3f3f
-    unsel = -1
-    best_sum_unsel = 0
-    best_min_unsel = 0
-
-    start = datetime.datetime.now()
-    for combo_s in selected_combinations:
-        # If time is exceeded break LS without improvement
-        # if datetime.timedelta(seconds=max_time) < datetime.datetime.now() - start:
-        #     print('Unable to find an improvement in the established time.')
-        #     break
-
-        pairwise_d = get_all_pairwise_distances(sol.instance, combo_s)
-        d_sum_s = [sol.distance_sum_to_solution(v) for v in combo_s] + pairwise_d
-        d_min_s = [sol.minimum_distance_to_solution(v) for v in combo_s] + pairwise_d
-        for combo_u in unselected_combinations:
-            # If time is exceeded break LS without improvement
-            # if datetime.timedelta(seconds=max_time) < datetime.datetime.now() - start:
-            #     print('Unable to find an improvement in the established time.')
-            #     break
-
-            pairwise_d = get_all_pairwise_distances(sol.instance, combo_u)
-            d_sum_u = [sol.distance_sum_to_solution(v, without=combo_s)
-                       for v in combo_u] + pairwise_d
-            d_min_u = [sol.minimum_distance_to_solution(v, without=combo_s)
-                       for v in combo_u] + pairwise_d
-
-            new_dominates_old = exchange_is_dominant(sum(d_sum_s), min(d_min_s),
-                                                     sum(d_sum_u), min(d_min_u))
-
-            if new_dominates_old \
-                and sol.satisfies_cost(combo_u, combo_s) \
-                    and sol.satisfies_capacity(combo_u, combo_s):
-
-                # Check if this new solution is better than the best exchange found so far
-                new_exch_dominates_old = exchange_is_dominant(best_sum_unsel-best_sum_sel,
-                                                              sum(d_sum_u)-sum(d_sum_s),
-                                                              best_min_unsel,
-                                                              min(d_min_u))
-                if new_exch_dominates_old:
-                    sel = combo_s
-                    best_sum_sel = sum(d_sum_s)
-                    best_min_sel = min(d_min_s)
-                    unsel = combo_u
-                    best_sum_unsel = sum(d_sum_u)
-                    best_min_unsel = min(d_min_u)
-
-    return sel, best_sum_sel, best_min_sel, unsel, best_sum_unsel, best_min_unsel
+    if len(selected) < switch[0] or len(unselected) < switch[1]:
+        return MoveSet.empty(switch)
+    # The 1-1 neighborhood is evaluated at once with array operations
+    if switch == [1, 1]:
+        moves = swap_moves(sol, selected, unselected, only_improving)
+        return moves if only_improving else moves.nondominated()
+
+    inst = sol.instance
+    d = inst['d']
+    S = np.asarray(selected, dtype=np.intp)
+    U = np.asarray(unselected, dtype=np.intp)
+    all_selected = np.flatnonzero(sol.selected)
+
+    combos_s, sums_s, mins_s = score_combinations(d, S, switch[0], np.round(sol.sum_to[S], 2),
+                                                  np.round(sol.min_to[S], 2))
+    # Pairs closer than current solution's MaxMin can't make a dominant exchange
+    min_pairwise = sol.of_MaxMin if only_improving else None
+    idx_u, pairwise_sum_u, pairwise_min_u = combination_distances(d, U, switch[1], min_pairwise)
+    cost_u = inst['a'][U][idx_u].sum(axis=1)
+    capacity_u = inst['c'][U][idx_u].sum(axis=1)
+
+    blocks = []
+    deadline = deadline or Deadline()
+    for i, combo_s in enumerate(combos_s):
+        # If time is exceeded break LS with the exchanges evaluated so far
+        if deadline.expired():
+            print('Unable to explore the whole neighbourhood in the established time.')
+            break
+
+        # Contributions of the unselected combinations to the solution without `combo_s`
+        d_us = np.asarray(d[np.ix_(U, combo_s)], dtype=np.float64)
+        node_sums = np.round(sol.sum_to[U] - d_us.sum(axis=1), 2)
+        node_mins = np.round(minimum_distances_without(sol, U, combo_s), 2)
+        sums_u, mins_u = combine_contributions(idx_u, node_sums, node_mins, pairwise_sum_u,
+                                               pairwise_min_u)
+
+        cost = sol.total_cost - inst['a'][combo_s].sum() + cost_u
+        capacity = sol.total_capacity - inst['c'][combo_s].sum() + capacity_u
+        keep = (cost < inst['K']) & (capacity > inst['B'])
+        if only_improving:
+            keep &= ((sums_s[i] <= sums_u) & (mins_s[i] <= mins_u)
+                     & ((sums_s[i] < sums_u) | (mins_s[i] < mins_u)))
+        cols = np.flatnonzero(keep)
+        if len(cols) == 0:
+            continue
+
+        # Objective function values of the new solutions
+        d_ss = np.asarray(d[np.ix_(combo_s, combo_s)], dtype=np.float64)
+        rest_sum = sol.of_MaxSum - sol.sum_to[combo_s].sum() + d_ss.sum() / 2
+        rest = all_selected[~is_any_of(all_selected, combo_s)]
+        rest_min = minimum_distances_without(sol, rest, combo_s).min(initial=BIG)
+        new_sum = np.round(rest_sum + sums_u[cols], 2)
+        new_min = np.minimum(rest_min, mins_u[cols])
+        if not only_improving:  # Only the non-dominated exchanges of each row are kept
+            keep = np.flatnonzero(get_nondominated_solutions(np.column_stack((new_sum, new_min))))
+            cols, new_sum, new_min = cols[keep], new_sum[keep], new_min[keep]
+        blocks.append((np.full(len(cols), i), cols, sums_u[cols], mins_u[cols], new_sum, new_min))
+
+    if not blocks:
+        return MoveSet.empty(switch)
+    rows, cols, sum_in, min_in, new_sum, new_min = (np.concatenate(b) for b in zip(*blocks))
+    moves = MoveSet(combos_s[rows], U[idx_u[cols]], sums_s[rows], mins_s[rows], sum_in, min_in,
+                    new_sum, new_min)
+    return moves if only_improving else moves.nondominated()
+
+
+def swap_moves(sol: Solution, selected: list, unselected: list,
+               only_improving: bool = True) -> 'MoveSet':
+    '''Finds the improving 1-1 exchanges using the matrices of a SwapEvaluation.
+
+    Args:
+      sol (Solution): contains the solution information.
+      selected (list): IDs of the selected nodes.
+      unselected (list): IDs of the unselected nodes.
+      only_improving (bool): if `False`, every feasible exchange is returned.
+
+    Returns:
+      (MoveSet): the improving (or feasible) exchanges.
+    '''
+    swaps = SwapEvaluation(sol, selected, unselected)
+    rows, cols = np.nonzero(swaps.improving() if only_improving else swaps.feasible)
+    return MoveSet(swaps.selected[rows][:, None], swaps.unselected[cols][:, None],
+                   swaps.sum_out[rows], swaps.min_out[rows],
+                   swaps.sum_in[rows, cols], swaps.min_in[rows, cols],
+                   swaps.new_sum[rows, cols], swaps.new_min[rows, cols])
+
+
+class MoveSet:
+    '''Exchanges of a neighborhood stored as arrays, with one exchange in each row.
+
+    Attributes:
+      removed (np.ndarray): IDs of the selected nodes removed by each exchange.
+      added (np.ndarray): IDs of the unselected nodes added by each exchange.
+      sum_out (np.ndarray): sum of distances from the removed nodes to the solution.
+      min_out (np.ndarray): minimum distance from the removed nodes to the solution.
+      sum_in (np.ndarray): sum of distances from the added nodes to the solution without the
+    removed nodes.
+      min_in (np.ndarray): minimum distance from the added nodes to the solution without the
+    removed nodes.
+      new_sum (np.ndarray): MaxSum value of the solution obtained with each exchange.
+      new_min (np.ndarray): MaxMin value of the solution obtained with each exchange.
+    '''
+    def __init__(self, removed: np.ndarray, added: np.ndarray, sum_out: np.ndarray,
+                 min_out: np.ndarray, sum_in: np.ndarray, min_in: np.ndarray,
+                 new_sum: np.ndarray, new_min: np.ndarray):
+        '''Initialize MoveSet'''
+        self.removed = removed
+        self.added = added
+        self.sum_out = sum_out
+        self.min_out = min_out
+        self.sum_in = sum_in
+        self.min_in = min_in
+        self.new_sum = new_sum
+        self.new_min = new_min
+
+    @staticmethod
+    def empty(switch: list) -> 'MoveSet':
+        '''Creates a set without exchanges of the neighborhood `switch`.'''
+        values = [np.empty(0) for _ in range(6)]
+        return MoveSet(np.empty((0, switch[0]), dtype=np.intp),
+                       np.empty((0, switch[1]), dtype=np.intp), *values)
+
+    def __len__(self) -> int:
+        return len(self.removed)
+
+    def subset(self, rows: np.ndarray) -> 'MoveSet':
+        '''Selects some of the exchanges.
+
+        Args:
+          rows (np.ndarray): indices of the selected exchanges.
+
+        Returns:
+          (MoveSet): a set with the selected exchanges.
+        '''
+        return MoveSet(self.removed[rows], self.added[rows], self.sum_out[rows],
+                       self.min_out[rows], self.sum_in[rows], self.min_in[rows],
+                       self.new_sum[rows], self.new_min[rows])
+
+    def nondominated(self) -> 'MoveSet':
+        '''Selects the exchanges leading to solutions that are not dominated by the solution of
+        another exchange in the set.'''
+        values = np.column_stack((self.new_sum, self.new_min))
+        return self.subset(np.flatnonzero(get_nondominated_solutions(values)))
+
+    def move(self, k: int) -> tuple:
+        '''Returns the exchange `k` in the format of `select_exchange`.'''
+        return (self.removed[k].tolist(), self.sum_out[k], self.min_out[k],
+                self.added[k].tolist(), self.sum_in[k], self.min_in[k])
+
+    def apply(self, sol: Solution, k: int):
+        '''Makes the exchange `k` in a solution.
+
+        Args:
+          sol (Solution): solution where the exchanges were evaluated.
+          k (int): index of the exchange.
+        '''
+        for v in self.added[k].tolist():
+            sol.add_to_solution(v, self.min_in[k], self.sum_in[k])
+        for u in self.removed[k].tolist():
+            sol.remove_from_solution(u, self.min_out[k], self.sum_out[k])
 
 
 def create_selected_unselected(sol: Solution, objective: int):
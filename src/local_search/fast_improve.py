@@ -3,17 +3,19 @@ Auxiliar function to apply Fast Improve Local Search.
 The worst selected element and best unselected element are interchanged to improve
 the initial solution.
 '''
-from itertools import combinations
+import numpy as np
 
+from local_search.swap_evaluation import (SwapEvaluation, minimum_distances_without,
+                                          score_combinations)
 from structure.dominance import exchange_is_dominant
-from structure.instance import get_all_pairwise_distances
 from structure.solution import Solution
+from utils.deadline import Deadline
 from utils.logger import load_logger
 
 logging = load_logger(__name__)
 
 
-def try_improvement(sol: Solution, objective: int, switch: int = [1, 1]) -> bool:
+def try_improvement(sol: Solution, switch: list = [1, 1], deadline: Deadline = None) -> bool:
     '''Attempts to improve a solution by selecting and interchanging a selected element (node)
     with an unselected element. The improvement is obtained if the new solution dominates the
     previous solution.
@@ -24,11 +26,15 @@ def try_improvement(sol: Solution, objective: int, switch: int = [1, 1]) -> bool
     first element defines how many nodes will be removed from the solution and the second
     element determines the number of nodes that will be added to the solution. Defaults to
     [1, 1] for a standard 1-1 exchange.
+      deadline (Deadline): optional time limit. The neighborhood is evaluated at once with array
+    operations, so it is only checked before the evaluation.
 
     Returns:
       (bool): `True` if the improvement was successful (i.e., if the objective values are
     dominant and constraints are met with the interchange), and `False` otherwise.
     '''
+    if deadline is not None and deadline.expired():
+        return False
     (worst_selected,
      sel_maxsum_variability, sel_maxmin,
      best_unselected,
@@ -47,9 +53,11 @@ def try_improvement(sol: Solution, objective: int, switch: int = [1, 1]) -> bool
 
 
 def select_exchange(sol: Solution, switch: list):
-    '''Interchanges the worst element in solution (lowest sum of distances to the rest of the
-    selected elements) with the best unselected element (highest sum of distances to the rest
-    of the selected elements).
+    '''Interchanges the worst combination of elements in solution (lowest sum and minimum distance
+    to the rest of the selected elements) with the best combination of unselected elements (highest
+    sum and minimum distance to the solution without the worst combination) that meets the
+    constraints. The scores of all the combinations are computed as arrays, and each choice is made
+    with `running_choice`.
 
     Args:
       sol (Solution): contains the solution information.
@@ -67,39 +75,101 @@ def select_exchange(sol: Solution, switch: list):
       best_min_unsel (float): minimum distance from `unsel` to the rest of the elements in
     solution.
     '''
-    n = sol.instance['n']
-    sel = -1
-    best_sum_sel = 0x3f3f3f3f
-    best_min_sel = 0x3f3f3f3f
-    unsel = -1
-    best_sum_unsel = 0
-    best_min_unsel = 0
-    # For every element combination of size switch[0] in current solution, select the
-    # one with the worst objective function values
-    for combo in combinations(sol.solution_set, switch[0]):
-        pairwise_d = get_all_pairwise_distances(sol.instance, combo)
-        d_sum = [sol.distance_sum_to_solution(v) for v in combo] + pairwise_d
-        d_min = [sol.minimum_distance_to_solution(v) for v in combo] + pairwise_d
-        if sum(d_sum) <= best_sum_sel and min(d_min) <= best_min_sel:
-            best_sum_sel = sum(d_sum)
-            best_min_sel = min(d_min)
-            sel = list(combo)
-
-    # For every element combination of size switch[1] in unselected candidate list, select
-    # the one with the best objective function values
-    for combo in combinations(range(n), switch[1]):
-        if not any(sol.contains(v) for v in combo):
-            pairwise_d = get_all_pairwise_distances(sol.instance, combo)
-            d_sum = [sol.distance_sum_to_solution(v, without=sel) for v in combo] + pairwise_d
-            d_min = [sol.minimum_distance_to_solution(v, without=sel) for v in combo] + pairwise_d
-            # Check if OFs of the new element(s) are better than the one(s) selected so far and
-            # if constraints are met. If True, change best unselected element(s).
-            if sum(d_sum) >= best_sum_unsel and min(d_min) >= best_min_unsel \
-                and sol.satisfies_cost(combo, sel) \
-                    and sol.satisfies_capacity(combo, sel):
-
-                best_sum_unsel = sum(d_sum)
-                best_min_unsel = min(d_min)
-                unsel = list(combo)
-
-    return sel, best_sum_sel, best_min_sel, unsel, best_sum_unsel, best_min_unsel
+    # The 1-1 neighborhood is evaluated at once with array operations
+    if switch == [1, 1]:
+        return select_swap(sol)
+
+    inst = sol.instance
+    # The choices depend on the order of the nodes, which is the one of the original loops: the
+    # iteration order of the selected set, and the unselected nodes by ID
+    selected = np.fromiter(sol.solution_set, dtype=np.intp, count=len(sol.solution_set))
+    unselected = np.flatnonzero(~sol.selected)
+
+    # Worst combination of switch[0] selected elements
+    combos_s, sums_s, mins_s = score_combinations(inst['d'], selected, switch[0],
+                                                  np.round(sol.sum_to[selected], 2),
+                                                  np.round(sol.min_to[selected], 2))
+    if len(combos_s) == 0:
+        return -1, 0x3f3f3f3f, 0x3f3f3f3f, -1, 0, 0
+    i = running_choice(sums_s, mins_s, 0x3f3f3f3f, 0x3f3f3f3f, worst=True)
+    sel = combos_s[i].tolist()
+
+    # Best combination of switch[1] unselected elements, scored without the removed elements
+    d_us = np.asarray(inst['d'][np.ix_(unselected, combos_s[i])], dtype=np.float64)
+    sums_u = np.round(sol.sum_to[unselected] - d_us.sum(axis=1), 2)
+    mins_u = np.round(minimum_distances_without(sol, unselected, combos_s[i]), 2)
+    # Pairs closer than current solution's MaxMin can't make a dominant exchange, but they are kept
+    # because they can still be chosen (and then no exchange is made)
+    combos_u, sums_u, mins_u = score_combinations(inst['d'], unselected, switch[1], sums_u,
+                                                  mins_u)
+    cost = sol.total_cost - int(inst['a'][sel].sum()) + inst['a'][combos_u].sum(axis=1)
+    capacity = sol.total_capacity - int(inst['c'][sel].sum()) + inst['c'][combos_u].sum(axis=1)
+    feasible = np.flatnonzero((cost < inst['K']) & (capacity > inst['B']))
+    j = running_choice(sums_u[feasible], mins_u[feasible], 0, 0, worst=False)
+    if j < 0:
+        return sel, sums_s[i], mins_s[i], -1, 0, 0
+    j = feasible[j]
+
+    return sel, sums_s[i], mins_s[i], combos_u[j].tolist(), sums_u[j], mins_u[j]
+
+
+def select_swap(sol: Solution):
+    '''Selects the worst selected node (lowest sum and minimum distance) and the best unselected
+    node to replace it (highest sum and minimum distance to the solution without the worst node,
+    among the exchanges that meet the constraints) using the matrices of a SwapEvaluation.
+
+    Args:
+      sol (Solution): contains the solution information.
+
+    Returns:
+      The same values returned by `select_exchange`.
+    '''
+    # The choices depend on the order of the nodes, which is the one of the original loops: the
+    # iteration order of the selected set, and the unselected nodes by ID
+    selected = np.fromiter(sol.solution_set, dtype=np.intp, count=len(sol.solution_set))
+    unselected = np.flatnonzero(~sol.selected)
+    if len(selected) == 0 or len(unselected) == 0:
+        return -1, 0x3f3f3f3f, 0x3f3f3f3f, -1, 0, 0
+    swaps = SwapEvaluation(sol, selected, unselected)
+    i = running_choice(swaps.sum_out, swaps.min_out, 0x3f3f3f3f, 0x3f3f3f3f, worst=True)
+    sel = [int(swaps.selected[i])]
+
+    cols = np.flatnonzero(swaps.feasible[i])
+    j = running_choice(swaps.sum_in[i, cols], swaps.min_in[i, cols], 0, 0, worst=False)
+    if j < 0:
+        return sel, swaps.sum_out[i], swaps.min_out[i], -1, 0, 0
+    j = cols[j]
+
+    return (sel, swaps.sum_out[i], swaps.min_out[i],
+            [int(swaps.unselected[j])], swaps.sum_in[i, j], swaps.min_in[i, j])
+
+
+def running_choice(sums: np.ndarray, mins: np.ndarray, best_sum: float, best_min: float,
+                   worst: bool) -> int:
+    '''Chooses an element as a running comparison over the elements in order would do: an element
+    replaces the current choice if it is not better (or not worse, if `worst` is `False`) in both
+    objectives, so ties are won by the latest element. Each step looks for the next replacement
+    among the elements that could replace the current choice, which are the only ones that can be
+    chosen later.
+
+    Args:
+      sums (np.ndarray): sum of distances of each element.
+      mins (np.ndarray): minimum distance of each element.
+      best_sum (float): sum of distances that the first choice has to improve (or tie).
+      best_min (float): minimum distance that the first choice has to improve (or tie).
+      worst (bool): if `True`, the lowest values are preferred, otherwise the highest ones.
+
+    Returns:
+      (int): position of the chosen element, or -1 if no element improves the initial values.
+    '''
+    sign = 1 if worst else -1
+    sums = sign * np.asarray(sums)
+    mins = sign * np.asarray(mins)
+    chosen = -1
+    candidates = np.flatnonzero((sums <= sign * best_sum) & (mins <= sign * best_min))
+    while len(candidates) > 0:
+        chosen = candidates[0]
+        candidates = candidates[1:]
+        candidates = candidates[(sums[candidates] <= sums[chosen])
+                                & (mins[candidates] <= mins[chosen])]
+    return int(chosen)
@@ -6,18 +6,25 @@ in the solution.
 '''
 from itertools import combinations
 
+import numpy as np
+
 from constructives.biased_randomized import create_candidate_list
+from local_search.search_state import SearchState
+from local_search.swap_evaluation import SwapEvaluation, first_exchange
 from structure.dominance import exchange_is_dominant
 from structure.instance import get_all_pairwise_distances
+from structure.pair_index import get_pair_index, use_pair_index
 from structure.solution import Solution
 
+from utils.deadline import Deadline
 from utils.logger import load_logger
 
 logging = load_logger(__name__)
 
 
 def try_improvement(sol: Solution, objective: int, improvement_criteria: str,
-                    switch: list = [1, 1]) -> bool:
+                    switch: list = [1, 1], stats: dict = None,
+                    deadline: Deadline = None, state: SearchState = None) -> bool:
     '''Attempts to improve a solution by selecting and interchanging a selected element (node)
     with an unselected element. The improvement is obtained if the new solution dominates the
     previous solution.
@@ -33,12 +40,21 @@ def try_improvement(sol: Solution, objective: int, improvement_criteria: str,
     element defines how many nodes will be removed from the solution and the second element
     determines the number of nodes that will be added to the solution. Defaults to [1, 1] for
     a standard 1-1 exchange.
+      stats (dict): optional counter where the number of exchanges evaluated exactly and skipped by
+    the optimistic bounds are accumulated for each neighborhood.
+      deadline (Deadline): optional time limit. When it expires, the exploration stops without
+    changing the solution.
+      state (SearchState): optional state shared by the iterations of the local search, with the
+    cached candidate lists and the don't-look bits of the selected nodes.
 
     Returns:
       (bool): `True` if the improvement was successful (i.e., if the objective values are
     dominant and constraints are met with the interchange), and `False` otherwise.
     '''
-    selected, unselected = create_selected_unselected(sol, objective)
+    if state is None:
+        selected, unselected = create_selected_unselected(sol, objective)
+    else:
+        selected, unselected = state.candidates(objective, create_selected_unselected)
 
     # Filter only possible dominant solutions for both objectives
     for constraint_objective in [0, 1]:
@@ -48,46 +64,75 @@ def try_improvement(sol: Solution, objective: int, improvement_criteria: str,
         if not (constraint_objective == 0 and switch[0] < switch[1]):
             unselected = [u for u in unselected
                           if u[constraint_objective] >= worst_selected_constraint]
-        else:
-            # TODO añadir para caso MaxSum y switch 1-2
-            pass
+        # Otherwise, the MaxSum upper bound of each combination is checked while generating them
+
+    # The 1-1 neighborhood is evaluated at once with array operations
+    if switch == [1, 1]:
+        return try_swap(sol, selected, unselected, objective, improvement_criteria)
 
     # First Improvement strategy:
     # Select the first combination of size switch[0] in current solution and the first combination
     # of size switch[1] in unselected candidate list whose exchange makes a dominant new solution
     # that mets the constraints.
+    a = sol.instance['a']
+    c = sol.instance['c']
 
-    # Build all the possible combinations of switch[0] elements among the selected nodes
-    selected_combinations = list(combinations(selected, switch[0]))
-    # Build all the possible combinations of switch[1] elements among the unselected nodes
-    unselected_combinations = list(combinations(unselected, switch[1]))
-    # Filter only combinations with a higher pairwise distance than current solution's MaxMin
-    if switch[1] > 1:
-        unselected_combinations = [combo_u for combo_u in unselected_combinations
-                                   if min(get_all_pairwise_distances(sol.instance,
-                                                                     [u[2] for u
-                                                                      in combo_u])) > sol.of_MaxMin]
+    # Combinations of switch[1] elements among the unselected nodes are generated lazily (and only
+    # once) while they are explored, discarding the ones that can't lead to a feasible solution
+    # Lowest sum of distances that an exchange has to reach to improve a selected combination
+    min_sum_s = -0x3f3f3f3f
+    if switch[0] == 1 and (improvement_criteria == 'Dom' or objective == 0):
+        min_sum_s = min(s[0] for s in selected)
+    # Exchanges (pairs of combinations) evaluated exactly and skipped by the bounds
+    counts = {'evaluated': 0, 'pruned': 0}
+    # Unselected combinations discarded by the bound while generating them, which skip an exchange
+    # in every pass over the stream of combinations that goes past them
+    generation = {'pruned': 0}
+    deadline = deadline or Deadline()
+    # The exchanges found non-improving with the 'Dom' criteria don't depend on the objective
+    key = (switch[0], switch[1], objective if improvement_criteria != 'Dom' else None)
+    unselected_combinations = CombinationStream(
+        generate_unselected_combinations(sol, unselected, switch, selected, min_sum_s,
+                                         generation))
 
     # For all the possible combinations between the selected elements
-    for combo_s in selected_combinations:
+    for combo_s in combinations(selected, switch[0]):
+        if deadline.expired():
+            update_pruning_stats(stats, switch, counts)
+            return False
         nodes_s = [s[2] for s in combo_s]  # Get node IDs
+        # Skip the combination if its nodes couldn't be improved and their neighbours are the same
+        if state is not None and state.skip(key, nodes_s):
+            continue
+        cost_s = sum(int(a[s]) for s in nodes_s)
+        capacity_s = sum(int(c[s]) for s in nodes_s)
         # Pairwise distances between all the nodes in combo_s
         pairwise_d = get_all_pairwise_distances(sol.instance, nodes_s)
         # Negative pairwise distance because it is considered twice (if there are 2 nodes)
         d_sum_s = [s[0] for s in combo_s] + [-d for d in pairwise_d]
         d_min_s = [s[1] for s in combo_s]  # + pairwise_d
         # For all the possible combinations between the unselected elements
-        for combo_u in unselected_combinations:
-            nodes_u = [u[2] for u in combo_u]  # Get node IDs
+        for (combo_u, nodes_u, cost_u, capacity_u, pairwise_d,
+             max_sum_u, max_min_u, pruned_u) in unselected_combinations:
             # If the constraints are not met with the new combo, try new exchange
-            if not (sol.satisfies_cost(nodes_u, nodes_s)
-                    and sol.satisfies_capacity(nodes_u, nodes_s)):
+            if not (sol.total_cost - cost_s + cost_u < sol.instance['K']
+                    and sol.total_capacity - capacity_s + capacity_u > sol.instance['B']):
                 continue
-            # Pairwise distances between all the nodes in combo_u
-            pairwise_d = get_all_pairwise_distances(sol.instance, nodes_u)
+            # Skip the exchange if even the optimistic bounds of combo_u can't improve combo_s
+            if not bounds_can_improve(sum(d_sum_s), min(d_min_s), max_sum_u, max_min_u,
+                                      objective, improvement_criteria):
+                counts['pruned'] += 1
+                continue
+            # If time is exceeded stop the exploration without improvement (only checked before
+            # the exact evaluations, as the pruned exchanges are much cheaper)
+            if deadline.expired():
+                counts['pruned'] += pruned_u
+                update_pruning_stats(stats, switch, counts)
+                return False
+            counts['evaluated'] += 1
             # Calculate d_sum_u for each node in combo_u removing the potential removed nodes in
             # combo_s from solution
-            d_sum_u = [u[0] - sum([sol.instance['d'][u[2]][s[2]] for s in combo_s])
+            d_sum_u = [u[0] - sum([sol.instance['d'][u[2], s[2]] for s in combo_s])
                        for u in combo_u] + pairwise_d
             # Calculate d_min_u for each node in combo_u without considering the potential removed
             # nodes in combo_s
@@ -113,10 +158,195 @@ def try_improvement(sol: Solution, objective: int, improvement_criteria: str,
                 for u in nodes_u:
                     sol.add_to_solution(u)
 
+                counts['pruned'] += pruned_u
+                update_pruning_stats(stats, switch, counts)
                 return True
+        # The pass went past every combination discarded while generating them
+        counts['pruned'] += generation['pruned']
+        # Every exchange of a single node has been tried (combinations of several nodes are only
+        # marked once the whole neighborhood has been explored)
+        if state is not None and switch[0] == 1:
+            state.mark(key, nodes_s)
+    if state is not None:
+        state.mark(key, [s[2] for s in selected])
+    update_pruning_stats(stats, switch, counts)
     return False
 
 
+def generate_unselected_combinations(sol: Solution, unselected: list, switch: list,
+                                     selected: list, min_sum_s: float, counts: dict):
+    '''Lazily generates the combinations of `switch[1]` unselected candidates in the order of the
+    `unselected` list. Combinations that can't meet the constraints with any combination of
+    `switch[0]` selected nodes, and combinations of several nodes with a pairwise distance that is
+    not higher than current solution's MaxMin, are discarded while generating.
+
+    Args:
+      sol (Solution): contains the solution information.
+      unselected (list): unselected candidates sorted from best to worst.
+      switch (list): indicates the neighborhood being analized in the local search.
+      selected (list): selected candidates, used to bound the most favourable removal.
+      min_sum_s (float): lowest sum of distances of a removed combination. Combinations whose
+    upper bound of the sum of distances is lower are discarded.
+      counts (dict): counter where the combinations discarded by the bound are added to 'pruned'.
+
+    Yields:
+      (tuple): the combination of candidates, their node IDs, their total cost and capacity, the
+    pairwise distances between them, the upper bounds of the sum of distances and the minimum
+    distance they can contribute to the new solution, and the number of combinations discarded by
+    the bound before it.
+    '''
+    a = sol.instance['a']
+    c = sol.instance['c']
+    # Most favourable removal for each constraint: the most expensive and least capacity nodes
+    max_cost_s = sum(sorted((int(a[s[2]]) for s in selected), reverse=True)[:switch[0]])
+    min_capacity_s = sum(sorted(int(c[s[2]]) for s in selected)[:switch[0]])
+    max_cost_u = sol.instance['K'] - sol.total_cost + max_cost_s
+    min_capacity_u = sol.instance['B'] - sol.total_capacity + min_capacity_s
+
+    # The pairs closer than current solution's MaxMin are discarded below, so they are skipped with
+    # the sorted neighbour lists when they are available
+    if switch[1] == 2 and use_pair_index(sol.instance):
+        unselected_combinations = generate_distant_pairs(sol, unselected)
+    else:
+        unselected_combinations = combinations(unselected, switch[1])
+
+    for combo_u in unselected_combinations:
+        nodes_u = [u[2] for u in combo_u]  # Get node IDs
+        cost_u = sum(int(a[u]) for u in nodes_u)
+        capacity_u = sum(int(c[u]) for u in nodes_u)
+        if cost_u >= max_cost_u or capacity_u <= min_capacity_u:
+            continue
+        # Pairwise distances between all the nodes in combo_u
+        pairwise_d = get_all_pairwise_distances(sol.instance, nodes_u)
+        # Filter only combinations with a higher pairwise distance than current solution's MaxMin
+        if pairwise_d and min(pairwise_d) <= sol.of_MaxMin:
+            continue
+        # The removed nodes can only decrease the sum of distances to the solution
+        max_sum_u = sum(u[0] for u in combo_u) + sum(pairwise_d)
+        if max_sum_u < min_sum_s:
+            counts['pruned'] += 1
+            continue
+        # Removing a single node, the minimum distance is at most the second closest one
+        max_min_u = min(pairwise_d, default=0x3f3f3f3f)
+        if switch[0] == 1:
+            max_min_u = min(max_min_u, min(sol.min2_to[u] for u in nodes_u))
+        yield (combo_u, nodes_u, cost_u, capacity_u, pairwise_d, max_sum_u, max_min_u,
+               counts['pruned'])
+
+
+def generate_distant_pairs(sol: Solution, unselected: list):
+    '''Lazily generates the pairs of unselected candidates whose distance is higher than current
+    solution's MaxMin, in the same order `combinations(unselected, 2)` would generate them. The
+    partners of each candidate are found with the sorted neighbour lists of the PairIndex.
+
+    Args:
+      sol (Solution): contains the solution information.
+      unselected (list): unselected candidates sorted from best to worst.
+
+    Yields:
+      (tuple): pair of unselected candidates.
+    '''
+    index = get_pair_index(sol.instance)
+    position = np.full(sol.instance['n'], -1, dtype=np.intp)
+    position[[u[2] for u in unselected]] = np.arange(len(unselected))
+    for i, u in enumerate(unselected):
+        partners = position[index.neighbours_above(u[2], sol.of_MaxMin)]
+        for j in np.sort(partners[partners > i]):
+            yield u, unselected[j]
+
+
+def bounds_can_improve(sum_s: float, min_s: float, max_sum_u: float, max_min_u: float,
+                       objective: int, improvement_criteria: str) -> bool:
+    '''Checks if the optimistic contributions of the added node(s) could improve the contributions
+    of the removed node(s) with the selected criteria.
+
+    Args:
+      sum_s (float): sum of distances contributed by the removed node(s).
+      min_s (float): minimum distance contributed by the removed node(s).
+      max_sum_u (float): upper bound of the sum of distances contributed by the added node(s).
+      max_min_u (float): upper bound of the minimum distance contributed by the added node(s).
+      objective (int): ID of the objective considered for this iteration. {0: MaxSum, 1: MaxMin}.
+      improvement_criteria (str): criteria used to consider that the new solution improves the
+    previous one ('Dom' or 'Alt').
+
+    Returns:
+      (bool): `False` if the exchange can't be an improvement, and `True` otherwise.
+    '''
+    if improvement_criteria == 'Dom':
+        return max_sum_u >= sum_s and max_min_u >= min_s
+    if objective == 0:
+        return max_sum_u > sum_s
+    return max_min_u > min_s
+
+
+def update_pruning_stats(stats: dict, switch: list, counts: dict):
+    '''Accumulates the number of exchanges evaluated exactly and skipped by bounds in a
+    neighborhood.
+
+    Args:
+      stats (dict): counter where the values are accumulated. Nothing is done if it is `None`.
+      switch (list): neighborhood [n_nodes_out, n_nodes_in] of the exchanges.
+      counts (dict): number of exchanges 'evaluated' exactly and 'pruned' by the bounds.
+    '''
+    if stats is not None:
+        neighborhood = f'{switch[0]}-{switch[1]}'
+        for key, value in counts.items():
+            stats[f'{key}_{neighborhood}'] = stats.get(f'{key}_{neighborhood}', 0) + value
+
+
+class CombinationStream:
+    '''Re-iterable wrapper of a combination generator. Items are produced on demand and stored, so
+    the next passes over the stream reuse them and the generation stops as soon as the exploration
+    does.'''
+    def __init__(self, generator):
+        '''Initialize CombinationStream'''
+        self._generator = generator
+        self._items = []
+        self._exhausted = False
+
+    def __iter__(self):
+        i = 0
+        while True:
+            if i == len(self._items):
+                if self._exhausted:
+                    return
+                try:
+                    self._items.append(next(self._generator))
+                except StopIteration:
+                    self._exhausted = True
+                    return
+            yield self._items[i]
+            i += 1
+
+
+def try_swap(sol: Solution, selected: list, unselected: list, objective: int,
+             improvement_criteria: str) -> bool:
+    '''Applies the first improving 1-1 exchange, following the order of the `selected` and
+    `unselected` candidate lists, using the matrices of a SwapEvaluation.
+
+    Args:
+      sol (Solution): contains the solution information.
+      selected (list): selected candidates sorted from worst to best.
+      unselected (list): unselected candidates sorted from best to worst.
+      objective (int): ID of the objective considered for this iteration. {0: MaxSum, 1: MaxMin}.
+      improvement_criteria (str): criteria used to consider that the new solution obtained with the
+    exchange improves the previous one ('Dom' or 'Alt').
+
+    Returns:
+      (bool): `True` if an improving exchange was performed, and `False` otherwise.
+    '''
+    if len(selected) == 0 or len(unselected) == 0:
+        return False
+    swaps = SwapEvaluation(sol, [s[2] for s in selected], [u[2] for u in unselected])
+    move = first_exchange(swaps.improving(improvement_criteria, objective))
+    if move is None:
+        return False
+    # Remove worst selected node from solution and add best unselected node to solution
+    sol.remove_from_solution(int(swaps.selected[move[0]]))
+    sol.add_to_solution(int(swaps.unselected[move[1]]))
+    return True
+
+
 def create_selected_unselected(sol: Solution, objective: int):
     '''Takes a solution instance as input and returns two lists - one containing selected items
     and the other containing unselected items based on the solution. The selected elements are
@@ -0,0 +1,101 @@
+'''
+Auxiliar function to apply Pareto Local Search.
+The local search works on an archive of non-dominated solutions instead of a single solution. The
+neighborhoods of each archive member are explored once, and every neighbour that is not dominated
+by the archive is inserted into it (removing the members it dominates) to be explored later.
+'''
+from collections import deque
+
+from local_search import best_improve as bes
+from structure.archive import ParetoArchive
+
+from utils.deadline import Deadline
+from utils.logger import load_logger
+
+logging = load_logger(__name__)
+
+
+def improve(solution_list: list, config: dict, stats: dict = None,
+            deadline: Deadline = None) -> list:
+    '''Improves a set of solutions until every member of their Pareto archive has been explored.
+
+    Args:
+      solution_list (list): SolutionSnapshot list used to initialize the archive (e.g. the
+    solutions of a construction).
+      config (dict): contains a 'neighborhoods' key with a dict value that contains the exchange
+    list [n_nodes_out, n_nodes_in] for each explored neighborhood. The 'execution_limits' limit the
+    time of each neighborhood exploration ('max_local_search_time') and the number of explored
+    archive members ('max_pls_explored', 20 by default), which is independent from the iterations
+    of the VND ('max_local_search_it') because exploring a member is much more expensive.
+      stats (dict): optional counter where the local search statistics (e.g. the number of
+    explored and inserted solutions) are accumulated.
+      deadline (Deadline): optional time limit of the whole execution. When the time is over the
+    search stops and returns the current archive.
+
+    Returns:
+      (list): SolutionSnapshot list with the non-dominated solutions found, sorted by MaxSum.
+    '''
+    # Get config parammeters
+    neighborhoods = config.get('neighborhoods')
+    max_time = config.get('execution_limits').get('max_local_search_time')
+    max_explored = config.get('execution_limits').get('max_pls_explored', 20)
+    deadline = deadline or Deadline()
+
+    archive = ParetoArchive()
+    seen = set()  # Node sets already inserted in (or rejected by) the archive
+    unexplored = deque()
+    for snapshot in solution_list:
+        if len(snapshot.nodes) > 0 and snapshot.solution_set not in seen:
+            seen.add(snapshot.solution_set)
+            if archive.add(snapshot):
+                unexplored.append(snapshot)
+
+    explored = 0
+    inserted = 0
+    timed_out = False
+    it_timeouts = 0
+    while unexplored and explored < max_explored:
+        # If time is exceeded stop the LS with the current archive
+        if deadline.expired(force=True):
+            timed_out = True
+            break
+        snapshot = unexplored.popleft()
+        # Skip the members removed from the archive since they were inserted
+        if archive.is_dominated(snapshot.of_MaxSum, snapshot.of_MaxMin):
+            continue
+
+        sol = snapshot.to_solution()
+        explored += 1
+        for switch in neighborhoods.values():
+            # Non-dominated neighbours of the current solution
+            it_deadline = deadline.limit(max_time)  # Time limit of this exploration
+            moves = bes.improving_moves(sol, 0, switch, it_deadline, only_improving=False)
+            if it_deadline.expired(force=True) and not deadline.expired(force=True):
+                it_timeouts += 1
+            for k in range(len(moves)):
+                if archive.is_dominated(moves.new_sum[k], moves.new_min[k]):
+                    continue
+                nodes = snapshot.solution_set.difference(moves.removed[k].tolist()).union(
+                    moves.added[k].tolist())
+                if nodes in seen:
+                    continue
+                seen.add(nodes)
+
+                neighbour = snapshot.to_solution()
+                moves.apply(neighbour, k)
+                neighbour = neighbour.snapshot()
+                if archive.add(neighbour):
+                    unexplored.append(neighbour)
+                    inserted += 1
+
+    print(f'Pareto local search explored {explored} solutions and inserted {inserted} neighbours '
+          f'in the archive ({len(archive)} non-dominated solutions).')
+    if timed_out:
+        print('Local search time limit reached.')
+    if stats is not None:
+        stats['ls_runs'] = stats.get('ls_runs', 0) + 1
+        stats['ls_timeouts'] = stats.get('ls_timeouts', 0) + int(timed_out)
+        stats['ls_it_timeouts'] = stats.get('ls_it_timeouts', 0) + it_timeouts
+        stats['pls_explored'] = stats.get('pls_explored', 0) + explored
+        stats['pls_inserted'] = stats.get('pls_inserted', 0) + inserted
+    return list(archive)
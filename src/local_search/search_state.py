@@ -0,0 +1,92 @@
+'''
+Auxiliar class to keep the state of a local search between its iterations.
+The sorted candidate lists of the current solution are reused until a move changes it, and
+don't-look bits mark the selected nodes whose exchanges were found non-improving in each
+neighborhood, so they are skipped until their closest selected nodes change.
+'''
+import numpy as np
+
+from structure.solution import Solution
+
+
+class SearchState:
+    '''State of a local search over a solution, shared by all its neighborhoods.
+
+    Attributes:
+      sol (Solution): solution being improved.
+      dont_look (bool): whether the don't-look bits are used to skip exchanges.
+      skipped (int): number of selected combinations skipped by the don't-look bits.
+    '''
+    def __init__(self, sol: Solution, dont_look: bool = False):
+        '''Initialize SearchState'''
+        self.sol = sol
+        self.dont_look = dont_look
+        self.skipped = 0
+        self._candidates = {}  # Sorted candidate lists of current solution for each objective
+        self._bits = {}  # Don't-look bits of each neighborhood
+        self._before = None
+
+    def candidates(self, objective: int, create_selected_unselected) -> tuple:
+        '''Returns the selected and unselected candidate lists of the solution sorted by
+        `objective`, computing them only once until a move changes the solution.
+
+        Args:
+          objective (int): ID of the objective used to sort the lists. {0: MaxSum, 1: MaxMin}.
+          create_selected_unselected (function): builds the lists from the solution.
+
+        Returns:
+          (tuple): the selected and unselected candidate lists (that must not be modified).
+        '''
+        if objective not in self._candidates:
+            self._candidates[objective] = create_selected_unselected(self.sol, objective)
+        return self._candidates[objective]
+
+    def skip(self, key: tuple, nodes: list) -> bool:
+        '''Checks if a combination of selected nodes can be skipped in a neighborhood, that is,
+        if the don't-look bits of all its nodes are set.
+
+        Args:
+          key (tuple): identifies the neighborhood (and criteria) of the bits.
+          nodes (list): IDs of the selected nodes in the combination.
+
+        Returns:
+          (bool): `True` if the combination can be skipped, and `False` otherwise.
+        '''
+        if not self.dont_look or key not in self._bits:
+            return False
+        if all(self._bits[key][v] for v in nodes):
+            self.skipped += 1
+            return True
+        return False
+
+    def mark(self, key: tuple, nodes: list):
+        '''Sets the don't-look bits of nodes whose exchanges are not improving in a neighborhood.
+
+        Args:
+          key (tuple): identifies the neighborhood (and criteria) of the bits.
+          nodes (list): IDs of the selected nodes.
+        '''
+        if self.dont_look:
+            if key not in self._bits:
+                self._bits[key] = np.zeros(self.sol.instance['n'], dtype=bool)
+            self._bits[key][nodes] = True
+
+    def checkpoint(self):
+        '''Saves the closest selected nodes before trying a move.'''
+        if self.dont_look:
+            self._before = (self.sol.selected.copy(), self.sol.nearest.copy(),
+                            self.sol.second.copy())
+
+    def moved(self):
+        '''Registers a move applied to the solution since the last checkpoint. The cached lists are
+        discarded, and the don't-look bits of the exchanged nodes, and of the nodes whose closest or
+        second closest selected node has changed (so their minimum distance contributions may have
+        changed), are cleared.'''
+        self._candidates = {}
+        if self.dont_look and self._before is not None:
+            selected, nearest, second = self._before
+            changed = ((selected != self.sol.selected) | (nearest != self.sol.nearest)
+                       | (second != self.sol.second))
+            for bits in self._bits.values():
+                bits[changed] = False
+            self._before = None
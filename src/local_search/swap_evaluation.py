@@ -0,0 +1,235 @@
+'''
+Auxiliar class and functions to evaluate exchange neighborhoods at once.
+For every (selected, unselected) pair, the contributions of the exchanged nodes, the objective
+function values of the resulting solution and its feasibility are computed as NumPy matrices
+from the incremental vectors kept by the Solution, without Python loops over the pairs. The
+contributions of combinations of several nodes are computed as arrays in the same way.
+'''
+from itertools import combinations
+
+import numpy as np
+
+from structure.solution import Solution
+
+BIG = 0x3f3f3f3f
+
+
+class SwapEvaluation:
+    '''Evaluation of every 1-1 exchange between the nodes in `selected` and `unselected`. Row `i`
+    of each matrix corresponds to removing `selected[i]` and column `j` to adding `unselected[j]`.
+
+    Attributes:
+      selected (np.ndarray): IDs of the selected nodes that can be removed.
+      unselected (np.ndarray): IDs of the unselected nodes that can be added.
+      sum_out (np.ndarray): sum of distances from each selected node to the rest of the solution.
+      min_out (np.ndarray): minimum distance from each selected node to the rest of the solution.
+      sum_in (np.ndarray): sum of distances from each unselected node to the solution without the
+    removed node.
+      min_in (np.ndarray): minimum distance from each unselected node to the solution without the
+    removed node.
+      new_sum (np.ndarray): MaxSum value of the solution obtained with each exchange.
+      new_min (np.ndarray): MaxMin value of the solution obtained with each exchange.
+      feasible (np.ndarray): whether each exchange meets the cost and capacity constraints.
+    '''
+    def __init__(self, sol: Solution, selected: list, unselected: list):
+        '''Initialize SwapEvaluation'''
+        inst = sol.instance
+        S = np.asarray(selected, dtype=np.intp)
+        U = np.asarray(unselected, dtype=np.intp)
+        self.selected = S
+        self.unselected = U
+
+        d_su = np.array(inst['d'][np.ix_(S, U)], dtype=np.float64)
+
+        # Contributions of the removed and added nodes
+        self.sum_out = np.round(sol.sum_to[S], 2)
+        self.min_out = sol.min_to[S]
+        self.sum_in = np.round(sol.sum_to[U], 2)[None, :] - d_su
+        # Closest node to each unselected node once the selected node in the row is removed
+        self.min_in = np.where(sol.nearest[U][None, :] == S[:, None],
+                               sol.min2_to[U][None, :], sol.min_to[U][None, :])
+
+        # MaxMin of the rest of the solution once each selected node is removed
+        all_selected = np.flatnonzero(sol.selected)
+        rest = np.where(sol.nearest[all_selected][None, :] == S[:, None],
+                        sol.min2_to[all_selected][None, :], sol.min_to[all_selected][None, :])
+        rest[all_selected[None, :] == S[:, None]] = BIG
+        rest_min = rest.min(axis=1) if len(all_selected) > 0 else np.full(len(S), BIG)
+
+        # Objective function values of the new solutions
+        self.new_sum = np.round(sol.of_MaxSum - self.sum_out[:, None] + self.sum_in, 2)
+        self.new_min = np.minimum(rest_min[:, None], self.min_in)
+
+        # Constraints of the new solutions
+        cost = sol.total_cost - inst['a'][S][:, None] + inst['a'][U][None, :]
+        capacity = sol.total_capacity - inst['c'][S][:, None] + inst['c'][U][None, :]
+        self.feasible = (cost < inst['K']) & (capacity > inst['B'])
+
+    def improving(self, improvement_criteria: str = 'Dom', objective: int = 0) -> np.ndarray:
+        '''Identifies the feasible exchanges whose added node improves the removed one, with the
+        same criteria used by the exchange-based local searches.
+
+        Args:
+          improvement_criteria (str): 'Dom' if the contributions of the added node must dominate
+        the ones of the removed node, or 'Alt' if only the `objective` contribution is compared.
+          objective (int): ID of the objective compared with the 'Alt' criteria.
+        {0: MaxSum, 1: MaxMin}.
+
+        Returns:
+          (np.ndarray): boolean matrix with the improving exchanges.
+        '''
+        sum_out = self.sum_out[:, None]
+        min_out = self.min_out[:, None]
+        if improvement_criteria == 'Dom':
+            improves = ((sum_out <= self.sum_in) & (min_out <= self.min_in)
+                        & ((sum_out < self.sum_in) | (min_out < self.min_in)))
+        elif objective == 0:
+            improves = sum_out < self.sum_in
+        else:
+            improves = min_out < self.min_in
+        return improves & self.feasible
+
+
+def first_exchange(mask: np.ndarray):
+    '''Finds the first exchange in row-major order (the order of `selected` and `unselected`)
+    marked in `mask`.
+
+    Args:
+      mask (np.ndarray): boolean matrix of exchanges.
+
+    Returns:
+      (tuple): row and column of the first marked exchange, or `None` if there is none.
+    '''
+    flat = mask.ravel()
+    k = int(np.argmax(flat)) if flat.size > 0 else 0
+    if flat.size == 0 or not flat[k]:
+        return None
+    return divmod(k, mask.shape[1])
+
+
+def combination_distances(d, nodes: np.ndarray, size: int, min_pairwise: float = None):
+    '''Builds every combination of `size` nodes and the sum and minimum of its pairwise distances.
+
+    Args:
+      d (np.ndarray): distance matrix of the instance.
+      nodes (np.ndarray): IDs of the candidate nodes.
+      size (int): number of nodes in each combination.
+      min_pairwise (float): if provided, combinations with a pairwise distance lower than it are
+    discarded.
+
+    Returns:
+      (tuple): matrix with the positions in `nodes` of a combination in each row (in lexicographic
+    order), and the sum and minimum of the pairwise distances of each combination.
+    '''
+    m = len(nodes)
+    if size == 1:
+        idx = np.arange(m)[:, None]
+    elif size == 2:  # Upper triangle of the pairs
+        idx = np.column_stack(np.triu_indices(m, 1))
+    else:
+        idx = np.array(list(combinations(range(m), size)), dtype=np.intp).reshape(-1, size)
+
+    pairwise_sum = np.zeros(len(idx))
+    pairwise_min = np.full(len(idx), BIG, dtype=np.float64)
+    keep = np.ones(len(idx), dtype=bool)
+    for a, b in combinations(range(size), 2):
+        pairwise_d = np.asarray(d[nodes[idx[:, a]], nodes[idx[:, b]]], dtype=np.float64)
+        pairwise_sum += pairwise_d
+        pairwise_min = np.minimum(pairwise_min, pairwise_d)
+        if min_pairwise is not None:
+            keep &= pairwise_d >= min_pairwise
+    return idx[keep], pairwise_sum[keep], pairwise_min[keep]
+
+
+def score_combinations(d, nodes: np.ndarray, size: int, sums: np.ndarray, mins: np.ndarray,
+                       min_pairwise: float = None):
+    '''Computes the objective contributions of every combination of `size` nodes: the sum of the
+    contributions of its nodes plus their pairwise distances, and the minimum among the minimum
+    distances of its nodes and their pairwise distances.
+
+    Args:
+      d (np.ndarray): distance matrix of the instance.
+      nodes (np.ndarray): IDs of the candidate nodes.
+      size (int): number of nodes in each combination.
+      sums (np.ndarray): sum of distances contributed by each node.
+      mins (np.ndarray): minimum distance contributed by each node.
+      min_pairwise (float): if provided, combinations with a pairwise distance lower than it are
+    discarded.
+
+    Returns:
+      (tuple): matrix with the node IDs of a combination in each row (in lexicographic order), and
+    the sum and minimum distance contributions of each combination.
+    '''
+    idx, pairwise_sum, pairwise_min = combination_distances(d, nodes, size, min_pairwise)
+    combo_sums, combo_mins = combine_contributions(idx, sums, mins, pairwise_sum, pairwise_min)
+    return nodes[idx], combo_sums, combo_mins
+
+
+def combine_contributions(idx: np.ndarray, sums: np.ndarray, mins: np.ndarray,
+                          pairwise_sum: np.ndarray, pairwise_min: np.ndarray):
+    '''Adds the contributions of the nodes of each combination to its pairwise distances. The
+    columns are accumulated one by one, which is much faster than reducing the rows of the
+    (short and wide) gathered matrices.
+
+    Args:
+      idx (np.ndarray): positions of the nodes of a combination in each row.
+      sums (np.ndarray): sum of distances contributed by each node.
+      mins (np.ndarray): minimum distance contributed by each node.
+      pairwise_sum (np.ndarray): sum of the pairwise distances of each combination.
+      pairwise_min (np.ndarray): minimum of the pairwise distances of each combination.
+
+    Returns:
+      (tuple): the sum and minimum distance contributions of each combination.
+    '''
+    combo_sums = pairwise_sum.copy()
+    combo_mins = pairwise_min.copy()
+    for col in idx.T:
+        combo_sums += sums[col]
+        np.minimum(combo_mins, mins[col], out=combo_mins)
+    return combo_sums, combo_mins
+
+
+def minimum_distances_without(sol: Solution, nodes: np.ndarray, removed: np.ndarray) -> np.ndarray:
+    '''Computes the minimum distance from each node to the solution without the `removed` nodes.
+    The two closest selected nodes are used when they are not removed, and the rest of the nodes
+    are checked against the remaining selected nodes.
+
+    Args:
+      sol (Solution): contains the solution information.
+      nodes (np.ndarray): IDs of the nodes.
+      removed (np.ndarray): IDs of the selected nodes excluded from the solution.
+
+    Returns:
+      (np.ndarray): minimum distance from each node to the rest of the solution.
+    '''
+    # Only a few nodes are removed, so comparing them one by one is faster than `np.isin`
+    nearest_removed = is_any_of(sol.nearest[nodes], removed)
+    second_removed = is_any_of(sol.second[nodes], removed)
+    mins = np.where(nearest_removed, sol.min2_to[nodes], sol.min_to[nodes])
+    rescan = np.flatnonzero(nearest_removed & second_removed)
+    if len(rescan) > 0:
+        rest = np.flatnonzero(sol.selected)
+        rest = rest[~is_any_of(rest, removed)]
+        mins[rescan] = BIG
+        if len(rest) > 0:
+            distances = np.asarray(sol.instance['d'][np.ix_(nodes[rescan], rest)],
+                                   dtype=np.float64)
+            distances[nodes[rescan][:, None] == rest[None, :]] = BIG
+            mins[rescan] = distances.min(axis=1)
+    return mins
+
+
+def is_any_of(values: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    '''Checks which values are equal to any of a few nodes.
+
+    Args:
+      values (np.ndarray): node IDs to check.
+      nodes (np.ndarray): IDs of the nodes (e.g. the nodes removed by an exchange).
+
+    Returns:
+      (np.ndarray): boolean array that indicates whether each value is in `nodes`.
+    '''
+    found = np.zeros(len(values), dtype=bool)
+    for u in nodes:
+        found |= values == u
+    return found
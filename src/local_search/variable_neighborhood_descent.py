@@ -4,8 +4,10 @@ Auxiliar function to apply Variable Neighborhood Descent.
 from local_search import best_improve as bes
 from local_search import fast_improve as fas
 from local_search import first_improve as fis
+from local_search.search_state import SearchState
 from structure.solution import Solution
 
+from utils.deadline import Deadline
 from utils.logger import load_logger
 
 logging = load_logger(__name__)
@@ -14,7 +16,8 @@ OBJECTIVE_FUNCTIONS = {0: 'MaxSum',
                        1: 'MaxMin'}
 
 
-def improve(sol: Solution, config: dict):
+def improve(sol: Solution, config: dict, stats: dict = None,
+            deadline: Deadline = None) -> bool:
     '''Iteratively tries to improve a solution until no further improvements can be made.
 
     Args:
@@ -26,6 +29,20 @@ def improve(sol: Solution, config: dict):
     key with a dict value that contains the exchange list [n_nodes_out, n_nodes_in] for each
     explored neighborhood. Finally, the 'scheme' key indicated if a First, Best or Fast approach
     will be used to make the improvement.
+      stats (dict): optional counter where the local search statistics (e.g. the number of
+    exchanges evaluated and pruned in each neighborhood) are accumulated.
+      deadline (Deadline): optional time limit of the whole execution. When the time is over, the
+    local search stops and keeps the best solution found so far (the current one, as every move
+    improves it). Besides, each LS iteration (the exploration of a neighborhood) is limited to
+    'max_local_search_time' seconds, after which the neighborhood is left without improvement.
+
+    The candidate lists of the solution are kept between the iterations until a move changes them
+    and, if 'dont_look_bits' is enabled, the selected nodes that couldn't be improved in a
+    neighborhood are skipped until a move changes their closest selected nodes.
+
+    Returns:
+      (bool): `False` if the local search or any of its iterations was stopped by a time limit
+    (so the solution may not be a local optimum), and `True` otherwise.
     '''
     # Get config parammeters
     ls_scheme = config.get('scheme')
@@ -36,13 +53,21 @@ def improve(sol: Solution, config: dict):
 
     max_time = config.get('execution_limits').get('max_local_search_time')
     max_it = config.get('execution_limits').get('max_local_search_it')
+    deadline = deadline or Deadline()
+    state = SearchState(sol, config.get('dont_look_bits', False))
 
     nb = 1  # Initialize with first neighborhood
     count = 0
     abs_count = 0
     improve = True
+    timed_out = False
+    it_timeouts = 0
     # Run improvement loop while solution is being improved in any neighborhood
     while (improve or nb <= len(neighborhoods)) and abs_count < max_it:
+        # If time is exceeded stop the LS with the current solution
+        if deadline.expired(force=True):
+            timed_out = True
+            break
         objective = abs_count % 2  # 0: MaxSum, 1: MaxMin (for Alt approach)
         # Check if a single objective approach is selected
         mo_approach = config.get('mo_approach_LS')
@@ -55,14 +80,20 @@ def improve(sol: Solution, config: dict):
         switch = neighborhoods[nb]
         print('Local searching in neighbourhood %s with switch type %s and %s objective.',
               nb, switch, 'Dom' if mo_approach == 'Dom' else OBJECTIVE_FUNCTIONS.get(objective))
+        state.checkpoint()
+        it_deadline = deadline.limit(max_time)  # Time limit of this LS iteration
         if ls_scheme == 'Best':
-            improve = bes.try_improvement(sol, switch=switch, max_time=max_time)
+            improve = bes.try_improvement(sol, switch=switch, deadline=it_deadline)
         elif ls_scheme == 'Fast':
-            improve = fas.try_improvement(sol, switch)
+            improve = fas.try_improvement(sol, switch, it_deadline)
         elif ls_scheme == 'First':
-            improve = fis.try_improvement(sol, objective, mo_approach, switch)
+            improve = fis.try_improvement(sol, objective, mo_approach, switch, stats, it_deadline,
+                                          state)
+        if it_deadline.expired(force=True) and not deadline.expired(force=True):
+            it_timeouts += 1
         if improve:
             print('Improved solution.')
+            state.moved()
             nb = 1  # Go back to first neighborhood
         else:
             print('Unable to improve solution. Change neighborhood.')
@@ -71,3 +102,12 @@ def improve(sol: Solution, config: dict):
         abs_count += 1
     print('Local search stopped with %s total IT and %s IT with no improvements.',
           abs_count, count)
+    if timed_out:
+        print('Local search time limit reached.')
+    if stats is not None:
+        stats['ls_runs'] = stats.get('ls_runs', 0) + 1
+        stats['ls_timeouts'] = stats.get('ls_timeouts', 0) + int(timed_out)
+        stats['ls_it_timeouts'] = stats.get('ls_it_timeouts', 0) + it_timeouts
+        stats['dont_look_skips'] = stats.get('dont_look_skips', 0) + state.skipped
+    # The last neighborhood may have been cut short by the time limit without being noticed here
+    return not (timed_out or it_timeouts > 0 or deadline.expired(force=True))
@@ -2,7 +2,7 @@
 import os
 import random
 
-from utils import execution
+from utils import scheduler
 from utils.config import read_config
 from utils.logger import load_logger
 
@@ -18,9 +18,6 @@ if __name__ == '__main__':
 
     path = os.path.join('instances', 'GDP', 'GKD-b_n50')
 
-    for config in config_list:
-        # execution.execute_instance(path, config)
-        for n in range(config.get('experiments')):
-            execution.execute_directory(path, config)
-
-        os.remove(os.path.join('temp', 'execution.txt'))
+    # Every config, experiment and instance, longest executions first over the instance workers
+    workers = max(config.get('instance_workers', 1) for config in config_list)
+    scheduler.run(path, config_list, workers)
@@ -0,0 +1,68 @@
+'''Auxiliar class to keep the non-dominated solutions found so far'''
+from bisect import bisect_left, bisect_right
+
+
+class ParetoArchive:
+    '''Bi-objective archive of non-dominated solutions (maximizing MaxSum and MaxMin). Entries are
+    kept sorted by increasing MaxSum, so their MaxMin values are non-increasing, and both checking
+    whether a new solution is dominated and locating the entries it dominates are binary searches.
+    As in `dominance.solution_is_dominant`, solutions with equal objective values do not dominate
+    each other, so duplicates are all kept (in insertion order).'''
+    def __init__(self):
+        '''Initialize ParetoArchive'''
+        self.sums = []  # MaxSum of each entry, increasing
+        self.neg_mins = []  # MaxMin of each entry (negated, so the list is increasing)
+        self.solutions = []
+
+    def __len__(self) -> int:
+        return len(self.solutions)
+
+    def __iter__(self):
+        return iter(self.solutions)
+
+    def is_dominated(self, of_MaxSum: float, of_MaxMin: float) -> bool:
+        '''Checks if a solution with the given objective values is dominated by an entry.
+
+        Args:
+          of_MaxSum (float): MaxSum value of the solution.
+          of_MaxMin (float): MaxMin value of the solution.
+
+        Returns:
+          (bool): indicates whether any entry is no worse in both objectives and better in one.
+        '''
+        # The entries with no lower MaxSum start at k, and the first one has the highest MaxMin
+        k = bisect_left(self.sums, of_MaxSum)
+        if k == len(self.sums) or -self.neg_mins[k] < of_MaxMin:
+            return False
+        return self.sums[k] > of_MaxSum or -self.neg_mins[k] > of_MaxMin
+
+    def add(self, sol) -> bool:
+        '''Inserts a solution if it is not dominated, removing the entries it dominates.
+
+        Args:
+          sol (Solution): any object with `of_MaxSum` and `of_MaxMin` attributes (e.g. a
+        SolutionSnapshot).
+
+        Returns:
+          (bool): indicates whether the solution has been inserted.
+        '''
+        of_MaxSum, of_MaxMin = sol.of_MaxSum, sol.of_MaxMin
+        if self.is_dominated(of_MaxSum, of_MaxMin):
+            return False
+
+        # Dominated entries have no higher MaxSum (before `end`) and no higher MaxMin (from
+        # `start`), except the duplicates of the new solution (entries with the same MaxSum share
+        # their MaxMin, so they are either all duplicates or all dominated)
+        end = bisect_right(self.sums, of_MaxSum)
+        start = bisect_left(self.neg_mins, -of_MaxMin, 0, end)
+        stop = end
+        if end > 0 and self.sums[end - 1] == of_MaxSum and -self.neg_mins[end - 1] == of_MaxMin:
+            stop = bisect_left(self.sums, of_MaxSum)
+        if start < stop:
+            del self.sums[start:stop], self.neg_mins[start:stop], self.solutions[start:stop]
+            end -= stop - start
+
+        self.sums.insert(end, of_MaxSum)
+        self.neg_mins.insert(end, -of_MaxMin)
+        self.solutions.insert(end, sol)
+        return True
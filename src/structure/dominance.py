@@ -1,4 +1,6 @@
 '''Auxiliar functions to find non-dominated solutions'''
+import numpy as np
+
 from structure.solution import Solution
 
 
@@ -53,22 +55,46 @@ def solution_is_dominant(sol1: Solution, sol2: Solution) -> bool:
     return True
 
 
-def get_nondominated_solutions(all_solutions: list) -> list:
+def get_nondominated_solutions(all_solutions) -> list:
     '''
-    Identifies non-dominated solutions within a list of solutions.
+    Identifies non-dominated solutions within a list of solutions. Solutions are sorted by MaxSum
+    (descending) and swept once keeping the best MaxMin found so far, so the filter costs
+    O(N log N). As in `solution_is_dominant`, solutions with equal objective values do not
+    dominate each other.
 
     Args:
-      all_solutions (list): solutions where each solution is represented as a Solution instance.
+      all_solutions (list or np.ndarray): solutions where each solution is represented as a
+    Solution instance (or any object with `of_MaxSum` and `of_MaxMin` attributes), or an array
+    with one row of objective values [MaxSum, MaxMin] per solution.
 
     Returns:
       (list of bool): each value indicates whether the corresponding solution in the input list
     `all_solutions` is non-dominated by any other solution in the list.
     '''
-    is_non_dominated = [True] * len(all_solutions)
-    for i, sol_i in enumerate(all_solutions):
-        for j, sol_j in enumerate(all_solutions):
-            if i != j and solution_is_dominant(sol_j, sol_i):
-                is_non_dominated[i] = False
-                break
-
-    return is_non_dominated
+    if isinstance(all_solutions, np.ndarray):
+        values = np.asarray(all_solutions, dtype=np.float64).reshape(-1, 2)
+    else:
+        values = np.array([[sol.of_MaxSum, sol.of_MaxMin] for sol in all_solutions],
+                          dtype=np.float64).reshape(-1, 2)
+    if len(values) == 0:
+        return []
+
+    # Sort by MaxSum and then by MaxMin, both descending
+    order = np.lexsort((-values[:, 1], -values[:, 0]))
+    sums = values[order, 0]
+    mins = values[order, 1]
+
+    # Groups of solutions with the same MaxSum (the first one has the highest MaxMin)
+    group_start = np.flatnonzero(np.r_[True, sums[1:] != sums[:-1]])
+    group = np.cumsum(np.r_[True, sums[1:] != sums[:-1]]) - 1
+    # Best MaxMin among the solutions with a strictly higher MaxSum
+    best_before = np.maximum.accumulate(mins)[group_start - 1]
+    best_before[0] = -np.inf
+
+    # A solution is dominated by a higher MaxSum with no lower MaxMin, or by the same MaxSum with
+    # a higher MaxMin
+    dominated = (best_before[group] >= mins) | (mins < mins[group_start][group])
+
+    is_non_dominated = np.empty(len(values), dtype=bool)
+    is_non_dominated[order] = ~dominated
+    return is_non_dominated.tolist()
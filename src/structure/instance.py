@@ -1,4 +1,5 @@
 '''Auxiliar function to read and process instances'''
+import numpy as np
 
 
 def read_instance(path: str) -> dict:
@@ -13,40 +14,63 @@ def read_instance(path: str) -> dict:
 
     Returns:
       (dict): contains the instance data. The dictionary includes the number of nodes `n`, the
-    number of nodes to be selected `p`, a distance matrix `d` representing the distances from each
-    node to the rest of the nodes, a cost vector `a` with the costs of each node, and a capacity
-    vector `a` with the capacities of each node.
+    number of nodes to be selected `p`, a distance matrix `d` (n x n NumPy array) representing the
+    distances from each node to the rest of the nodes, a cost vector `a` (NumPy array) with the
+    costs of each node, and a capacity vector `c` (NumPy array) with the capacities of each node.
     '''
-    instance = {}
     with open(path, "r") as f:
-        n = int(f.readline())
-        instance['n'] = n  # Size
-        instance['d'] = []  # Distance matrix
-        instance['a'] = [0] * n  # Cost vector
-        instance['c'] = [0] * n  # Capacity vector
-        for _ in range(n):
-            instance['d'].append([0] * n)
-        for i in range(n):
-            for _ in range(i+1, n):
-                u, v, d = f.readline().split()
-                u = int(u) - 1  # Node u
-                v = int(v) - 1  # Node v
-                d = round(float(d), 2)  # Distance between u and v
-                instance['d'][u][v] = d
-                instance['d'][v][u] = d
-        for i in range(n):
-            u, a, _, c = f.readline().split()
-            u = int(u) - 1  # Node u
-            a = int(float(a))  # Cost of node u
-            c = int(float(c))  # Capacity of node u
-            instance['a'][u] = a
-            instance['c'][u] = c
-        K, _, B = map(int, f.readline().split())
-        instance['K'] = K  # Maximum budget
-        instance['B'] = B  # Minimum capacity
+        # Parse the whole file in one pass instead of reading the edges line by line
+        data = np.array(f.read().split(), dtype=np.float64)
+
+    n = int(data[0])
+    n_edges = n * (n - 1) // 2
+    edges_end = 1 + 3*n_edges  # Edge block: (u, v, d) for every node pair
+    nodes_end = edges_end + 4*n  # Node block: (u, a, _, c) for every node
+    edges = data[1:edges_end].reshape(n_edges, 3)
+    nodes = data[edges_end:nodes_end].reshape(n, 4)
+    K, _, B = data[nodes_end:nodes_end + 3].astype(np.int64)
+
+    u = edges[:, 0].astype(np.intp) - 1  # Node u
+    v = edges[:, 1].astype(np.intp) - 1  # Node v
+    d = np.zeros((n, n), dtype=np.float64)  # Distance matrix
+    d[u, v] = round_distances(edges[:, 2])  # Distance between u and v
+    d[v, u] = d[u, v]
+
+    u = nodes[:, 0].astype(np.intp) - 1  # Node u
+    a = np.zeros(n, dtype=np.int64)  # Cost vector
+    c = np.zeros(n, dtype=np.int64)  # Capacity vector
+    a[u] = nodes[:, 1].astype(np.int64)  # Cost of node u
+    c[u] = nodes[:, 3].astype(np.int64)  # Capacity of node u
+
+    instance = {}
+    instance['n'] = n  # Size
+    instance['d'] = d
+    instance['a'] = a
+    instance['c'] = c
+    instance['K'] = int(K)  # Maximum budget
+    instance['B'] = int(B)  # Minimum capacity
     return instance
 
 
+def round_distances(x: np.ndarray) -> np.ndarray:
+    '''Rounds the distances to 2 decimals with the same results as Python's `round`. `np.round`
+    scales the values before rounding them, so the values that are (almost) halfway between two
+    decimals, such as 2.675, may be rounded to the other side. These values are rounded with
+    `round`.
+
+    Args:
+      x (np.ndarray): distances to be rounded.
+
+    Returns:
+      (np.ndarray): distances rounded to 2 decimals.
+    '''
+    y = np.round(x, 2)
+    scaled = x * 100
+    halfway = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    y[halfway] = [round(value, 2) for value in x[halfway].tolist()]
+    return y
+
+
 def get_all_pairwise_distances(instance: dict, node_list: list) -> list:
     '''
     The function calculates all pairwise distances between nodes in a given node list using a
@@ -66,5 +90,93 @@ def get_all_pairwise_distances(instance: dict, node_list: list) -> list:
     distance_between = []
     for i, u in enumerate(node_list):
         for v in node_list[i+1:]:
-            distance_between.append(instance['d'][u][v])
+            distance_between.append(instance['d'][u, v])
     return distance_between
+
+
+class CondensedDistances:
+    '''Read-only distance matrix that stores only the upper triangle of the symmetric matrix in
+    a flat (condensed) array, which can be a memory-mapped file shared by several processes. It
+    supports the same indexing used on the dense matrix: `d[u, v]` for a single distance, `d[u]`
+    for the distances from `u` to every node, and `d[rows, cols]` with broadcastable index arrays
+    (e.g. built with `np.ix_`).'''
+    def __init__(self, data: np.ndarray, n: int):
+        '''Initialize CondensedDistances'''
+        self.data = data
+        self.n = n
+        self.shape = (n, n)
+        self.dtype = data.dtype
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, key):
+        '''Maps the (row, column) indexes of the full matrix to positions of the upper triangle.
+
+        Args:
+          key (int or tuple): a node ID to get its whole distance row, or a pair of node IDs or
+        broadcastable index arrays.
+
+        Returns:
+          (float or np.ndarray): the requested distance(s).
+        '''
+        if not isinstance(key, tuple):
+            return self.row(key)
+        rows, cols = key
+        if np.isscalar(rows) and np.isscalar(cols):
+            if rows == cols:
+                return self.dtype.type(0)
+            return self.data[condensed_index(min(rows, cols), max(rows, cols), self.n)]
+        rows, cols = np.broadcast_arrays(np.asarray(rows), np.asarray(cols))
+        lo = np.minimum(rows, cols)
+        hi = np.maximum(rows, cols)
+        diagonal = lo == hi
+        idx = condensed_index(lo, np.where(diagonal, lo + 1, hi), self.n)
+        distances = self.data[np.minimum(idx, len(self.data) - 1)]
+        distances[diagonal] = 0
+        return distances
+
+    def row(self, u: int) -> np.ndarray:
+        '''Builds the distances from node `u` to every node of the instance.
+
+        Args:
+          u (int): represents the ID of a node.
+
+        Returns:
+          (np.ndarray): vector of size `n` with the distances from `u` (0 for `u` itself).
+        '''
+        n = self.n
+        distances = np.empty(n, dtype=self.dtype)
+        before = np.arange(u)  # Nodes v < u, stored in row v of the triangle
+        distances[:u] = self.data[condensed_index(before, u, n)]
+        distances[u] = 0
+        start = condensed_index(u, u + 1, n)  # Nodes v > u, stored contiguously in row u
+        distances[u+1:] = self.data[start:start + n - u - 1]
+        return distances
+
+
+def condensed_index(u, v, n: int):
+    '''Position of the distance between nodes `u` < `v` in the condensed upper triangle of an
+    `n` x `n` matrix.
+
+    Args:
+      u (int or np.ndarray): row node ID(s), lower than `v`.
+      v (int or np.ndarray): column node ID(s).
+      n (int): number of nodes of the instance.
+
+    Returns:
+      (int or np.ndarray): index (or indexes) in the condensed array.
+    '''
+    return u * n - u * (u + 1) // 2 + (v - u - 1)
+
+
+def condense_distances(d: np.ndarray) -> np.ndarray:
+    '''Extracts the upper triangle of a symmetric distance matrix row by row.
+
+    Args:
+      d (np.ndarray): n x n distance matrix.
+
+    Returns:
+      (np.ndarray): condensed array of size n(n-1)/2.
+    '''
+    return d[np.triu_indices(len(d), 1)]
@@ -0,0 +1,165 @@
+'''Auxiliar functions to cache parsed instances as binary files'''
+import hashlib
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from structure.instance import CondensedDistances, condense_distances, read_instance
+
+CACHE_VERSION = 2  # Increase when the cached file layout or the parsed values change
+DISTANCE_FILES = {'Dense': 'd.npy',
+                  'Condensed': 'd_condensed.npy'}
+
+
+def load_instance(path: str, cache_dir: str = None, distances: str = 'Dense') -> dict:
+    '''Loads an instance from the binary cache in `cache_dir`, parsing the text file with
+    `read_instance` and storing the result in the cache if it is not there yet. Cached arrays are
+    memory-mapped read-only, so the same instance loaded by several processes shares its pages.
+
+    Args:
+      path (str): file path to the instance file that contains the data to be read and processed.
+      cache_dir (str): directory where the binary instances are stored. If it is not provided,
+    the instance is parsed from the text file without caching.
+      distances (str): storage of the distance matrix `d`. 'Dense' keeps the full n x n matrix,
+    while 'Condensed' keeps only its upper triangle behind a `CondensedDistances` accessor.
+
+    Returns:
+      (dict): contains the instance data with the same keys returned by `read_instance`. Cached
+    instances also contain the directory of their entry in 'cache_entry', where the arrays derived
+    from the instance are stored with `load_arrays`.
+    '''
+    if not cache_dir:
+        instance = read_instance(path)
+        if distances == 'Condensed':
+            instance['d'] = CondensedDistances(condense_distances(instance['d']), instance['n'])
+        return instance
+
+    parsed = []  # Parse the text file at most once, only if something is missing in the cache
+
+    def parse():
+        if not parsed:
+            parsed.append(read_instance(path))
+        return parsed[0]
+
+    entry = os.path.join(cache_dir, get_instance_key(path))
+    if not os.path.isdir(entry):
+        _store_instance(parse(), cache_dir, entry)
+
+    distance_file = DISTANCE_FILES.get(distances)
+    if not os.path.exists(os.path.join(entry, distance_file)):
+        d = parse()['d']
+        _store_array(entry, distance_file, condense_distances(d) if distances == 'Condensed' else d)
+
+    return _load_entry(entry, distances)
+
+
+def get_instance_key(path: str) -> str:
+    '''Computes the cache key of an instance file as a hash of its content, so any change in the
+    source file invalidates the cached entry.
+
+    Args:
+      path (str): file path to the instance file.
+
+    Returns:
+      (str): hexadecimal SHA-1 digest of the cache version and the file content.
+    '''
+    digest = hashlib.sha1(f'v{CACHE_VERSION}'.encode())
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_arrays(entry: str, prefix: str, names: tuple, build) -> dict:
+    '''Loads arrays derived from a cached instance (e.g. its PairIndex), memory-mapped read-only
+    so the processes solving the instance share their pages. If any of them is not in the entry
+    yet, they are built and stored first.
+
+    Args:
+      entry (str): directory of the cached instance.
+      prefix (str): prefix of the file names of the arrays inside the entry.
+      names (tuple): names of the arrays.
+      build (callable): function without arguments that returns a dict with the arrays.
+
+    Returns:
+      (dict): memory-mapped arrays by name.
+    '''
+    files = {name: f'{prefix}_{name}.npy' for name in names}
+    if not all(os.path.exists(os.path.join(entry, file)) for file in files.values()):
+        arrays = build()
+        for name, file in files.items():
+            _store_array(entry, file, arrays[name])
+        del arrays  # Only the shared memory-mapped copies are kept
+    return {name: np.load(os.path.join(entry, file), mmap_mode='r') for name, file in files.items()}
+
+
+def _store_instance(instance: dict, cache_dir: str, entry: str):
+    '''Writes the cost, capacity and constraint arrays of the instance in a private temporary
+    directory and publishes it with an atomic rename, so processes filling the cache at the same
+    time never read a partial entry. If another process publishes the same entry first, the
+    temporary copy is discarded. The distance matrix is stored separately by `_store_array`.
+
+    Args:
+      instance (dict): contains the instance data returned by `read_instance`.
+      cache_dir (str): directory where the binary instances are stored.
+      entry (str): final directory of the cached instance.
+    '''
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_entry = f'{entry}.{uuid.uuid4().hex}.tmp'
+    os.makedirs(tmp_entry)
+    try:
+        np.save(os.path.join(tmp_entry, 'a.npy'), instance['a'])
+        np.save(os.path.join(tmp_entry, 'c.npy'), instance['c'])
+        np.save(os.path.join(tmp_entry, 'constraints.npy'),
+                np.array([instance['n'], instance['K'], instance['B']], dtype=np.int64))
+        os.rename(tmp_entry, entry)
+    except OSError:
+        # Another process already published this entry
+        if not os.path.isdir(entry):
+            raise
+    finally:
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+
+
+def _store_array(entry: str, name: str, array: np.ndarray):
+    '''Adds an array to a published cache entry through a temporary file and an atomic replace,
+    so concurrent writers of the same (identical) array never expose a partial file.
+
+    Args:
+      entry (str): directory of the cached instance.
+      name (str): file name of the array inside the entry.
+      array (np.ndarray): data to be stored.
+    '''
+    tmp_file = os.path.join(entry, f'{uuid.uuid4().hex}.tmp.npy')
+    try:
+        np.save(tmp_file, array)
+        os.replace(tmp_file, os.path.join(entry, name))
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def _load_entry(entry: str, distances: str) -> dict:
+    '''Builds the instance dictionary from a cached entry, memory-mapping the arrays.
+
+    Args:
+      entry (str): directory of the cached instance.
+      distances (str): storage of the distance matrix `d`, 'Dense' or 'Condensed'.
+
+    Returns:
+      (dict): contains the instance data with the same keys returned by `read_instance`.
+    '''
+    n, K, B = np.load(os.path.join(entry, 'constraints.npy'))
+
+    instance = {}
+    instance['n'] = int(n)  # Size
+    d = np.load(os.path.join(entry, DISTANCE_FILES.get(distances)), mmap_mode='r')
+    instance['d'] = CondensedDistances(d, int(n)) if distances == 'Condensed' else d
+    instance['a'] = np.load(os.path.join(entry, 'a.npy'), mmap_mode='r')
+    instance['c'] = np.load(os.path.join(entry, 'c.npy'), mmap_mode='r')
+    instance['K'] = int(K)  # Maximum budget
+    instance['B'] = int(B)  # Minimum capacity
+    instance['cache_entry'] = entry  # Where the arrays derived from the instance are stored
+    return instance
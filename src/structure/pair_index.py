@@ -0,0 +1,157 @@
+'''Auxiliar class to query the neighbours of the nodes of an instance by distance'''
+import numpy as np
+
+from structure import instance_cache
+
+PAIR_ARRAYS = ('neighbours', 'neighbour_d')
+
+
+class PairIndex:
+    '''Index of the neighbours of each node of an instance sorted by distance. It is built once per
+    instance, and threshold queries (e.g. the nodes farther from a node than current solution's
+    MaxMin) are answered with a binary search and a slice instead of checking every node.'''
+    def __init__(self, instance: dict, arrays: dict = None):
+        '''Initialize PairIndex'''
+        self.n = instance['n']
+        if arrays is None:
+            arrays = build_pair_arrays(instance)
+        for name in PAIR_ARRAYS:
+            setattr(self, name, arrays[name])
+
+    def position(self, nodes: np.ndarray, targets: np.ndarray,
+                 distances: np.ndarray) -> np.ndarray:
+        '''Finds the position of each node in `targets` in the sorted neighbour list of the node in
+        the same position of `nodes`. The lists of all the nodes are binary searched at once by
+        (distance, node ID), the order of the lists.
+
+        Args:
+          nodes (np.ndarray): IDs of the nodes whose neighbour lists are searched.
+          targets (np.ndarray): IDs of the searched neighbours.
+          distances (np.ndarray): distance from each node to its target.
+
+        Returns:
+          (np.ndarray): position of each target in the neighbour list of its node.
+        '''
+        lo = np.zeros(len(nodes), dtype=np.intp)
+        hi = np.full(len(nodes), self.n - 1, dtype=np.intp)
+        for _ in range((self.n - 1).bit_length()):
+            mid = np.minimum((lo + hi) // 2, self.n - 2)
+            mid_d = self.neighbour_d[nodes, mid]
+            before = (mid_d < distances) | ((mid_d == distances)
+                                            & (self.neighbours[nodes, mid] < targets))
+            searching = lo < hi
+            lo = np.where(searching & before, mid + 1, lo)
+            hi = np.where(searching & ~before, mid, hi)
+        return lo
+
+    def next_in(self, nodes: np.ndarray, start: np.ndarray, mask: np.ndarray,
+                window: int = 8) -> np.ndarray:
+        '''Finds, for each node in `nodes`, the first neighbour marked in `mask` from position
+        `start` of its sorted neighbour list. The lists of all the nodes are scanned at once in
+        windows of increasing size, so each node only reads the positions up to its result.
+
+        Args:
+          nodes (np.ndarray): IDs of the nodes whose neighbour lists are scanned.
+          start (np.ndarray): first position of the scan in the neighbour list of each node.
+          mask (np.ndarray): boolean vector of size `n` with the neighbours that can be returned.
+          window (int): number of positions read in the first scan.
+
+        Returns:
+          (np.ndarray): position of the first marked neighbour of each node, or `n - 1` (end of
+        the list) if there is none.
+        '''
+        last = self.n - 1
+        found = np.full(len(nodes), last, dtype=np.intp)
+        pending = np.arange(len(nodes))
+        start = np.asarray(start, dtype=np.intp)
+        while len(pending) > 0:
+            positions = start[pending, None] + np.arange(window)[None, :]
+            in_list = positions < last
+            candidates = self.neighbours[nodes[pending, None], np.minimum(positions, last - 1)]
+            hits = mask[candidates] & in_list
+            hit = hits.any(axis=1)
+            found[pending[hit]] = positions[hit, hits[hit].argmax(axis=1)]
+            # Continue with the nodes that haven't reached the end of their list
+            pending = pending[~hit & in_list[:, -1]]
+            start = start.copy()
+            start[pending] += window
+            window *= 2
+        return found
+
+    def neighbours_above(self, u: int, threshold: float, strict: bool = True) -> np.ndarray:
+        '''Finds the nodes whose distance to `u` is higher than `threshold`.
+
+        Args:
+          u (int): represents the ID of a node.
+          threshold (float): minimum distance to `u`.
+          strict (bool): if `False`, nodes at exactly `threshold` distance are also included.
+
+        Returns:
+          (np.ndarray): IDs of the nodes, sorted by distance to `u`.
+        '''
+        start = np.searchsorted(self.neighbour_d[u], threshold,
+                                side='right' if strict else 'left')
+        return self.neighbours[u, start:]
+
+
+def build_pair_arrays(instance: dict) -> dict:
+    '''Sorts the neighbours of each node of an instance by distance.
+
+    Args:
+      instance (dict): contains the instance data.
+
+    Returns:
+      (dict): arrays of the index, with the names in `PAIR_ARRAYS`.
+    '''
+    n = instance['n']
+    d = instance['d']
+
+    # Neighbours of each node sorted by distance, with ties sorted by node ID (the node itself is
+    # not included)
+    neighbours = np.empty((n, n - 1), dtype=np.int32)
+    neighbour_d = np.empty((n, n - 1), dtype=np.float64)
+    for u in range(n):
+        row = np.array(d[u], dtype=np.float64)
+        row[u] = np.inf
+        nodes = np.argsort(row, kind='stable')[:-1]
+        neighbours[u] = nodes
+        neighbour_d[u] = row[nodes]
+    return {'neighbours': neighbours, 'neighbour_d': neighbour_d}
+
+
+def use_pair_index(instance: dict) -> bool:
+    '''Checks if the PairIndex of an instance can be used without a large private copy: it is
+    already built, its arrays are memory-mapped from the binary cache (and shared by the processes
+    solving the instance), or the distance matrix is dense (so the index is about as large as it).
+    With condensed distances and no cache, the index would take several times the memory of the
+    distances in every process, so the callers fall back to the distance matrix.
+
+    Args:
+      instance (dict): contains the instance data.
+
+    Returns:
+      (bool): `True` if the index can be requested with `get_pair_index`.
+    '''
+    return ('index' in instance or instance.get('cache_entry') is not None
+            or isinstance(instance['d'], np.ndarray))
+
+
+def get_pair_index(instance: dict) -> PairIndex:
+    '''Returns the PairIndex of an instance, building it the first time it is requested. If the
+    instance was loaded from the binary cache, the arrays of the index are stored in its entry and
+    memory-mapped, so the processes solving the same instance share them.
+
+    Args:
+      instance (dict): contains the instance data.
+
+    Returns:
+      (PairIndex): the index of the instance.
+    '''
+    if 'index' not in instance:
+        entry = instance.get('cache_entry')
+        arrays = None
+        if entry is not None:
+            arrays = instance_cache.load_arrays(entry, 'index', PAIR_ARRAYS,
+                                                lambda: build_pair_arrays(instance))
+        instance['index'] = PairIndex(instance, arrays)
+    return instance['index']
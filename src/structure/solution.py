@@ -1,15 +1,55 @@
 '''Auxiliar class to handle candidate solutions'''
+import numpy as np
+
+from structure.pair_index import get_pair_index, use_pair_index
+
+SCAN_FACTOR = 16  # Minimum n_selected^2 / n ratio to scan the sorted neighbour lists
+ZOBRIST_SEED = 0x5EED  # Fixed, so the hash of a solution is the same in every process
+
+
+def get_zobrist_keys(instance: dict) -> list:
+    '''Returns the random 64-bit key of each node of an instance, generating them the first time
+    they are requested. The hash of a set of nodes is the XOR of their keys.
+
+    Args:
+      instance (dict): contains the instance data.
+
+    Returns:
+      (list of int): the key of each node.
+    '''
+    if 'zobrist' not in instance:
+        rng = np.random.default_rng(ZOBRIST_SEED)
+        instance['zobrist'] = rng.integers(0, 2**64, instance['n'], dtype=np.uint64).tolist()
+    return instance['zobrist']
 
 
 class Solution:
-    '''Auxiliar class to handle solution information'''
+    '''Auxiliar class to handle solution information. Besides the selected set, it keeps for every
+    node of the instance the sum of its distances to the selected nodes (`sum_to`), and its closest
+    (`nearest`, at distance `min_to`) and second closest (`second`, at distance `min2_to`) selected
+    nodes. Both objective contributions are O(1) lookups, also when the node(s) removed by a 1-out
+    exchange are excluded, and each addition or removal costs a single O(n) update over the
+    distance row of the changed node. The Zobrist hash of the selected set (`hash_key`) is also
+    updated with each addition or removal, so equal sets are identified in O(1).'''
+    __slots__ = ('instance', 'solution_set', 'selected', 'sum_to',
+                 'min_to', 'nearest', 'min2_to', 'second',
+                 'of_MaxSum', 'of_MaxMin', 'total_cost', 'total_capacity', 'hash_key')
+
     def __init__(self, instance: dict):
         '''Initialize Solution'''
+        n = instance['n']
         self.solution_set = set()
+        self.selected = np.zeros(n, dtype=bool)  # Membership mask
+        self.sum_to = np.zeros(n)  # Sum of distances from each node to the selected nodes
+        self.min_to = np.full(n, 0x3f3f3f3f, dtype=np.float64)  # Min distance to selected nodes
+        self.nearest = np.full(n, -1, dtype=np.intp)  # Closest selected node (-1 if none)
+        self.min2_to = np.full(n, 0x3f3f3f3f, dtype=np.float64)  # Second min distance
+        self.second = np.full(n, -1, dtype=np.intp)  # Second closest selected node (-1 if none)
         self.of_MaxSum = 0
         self.of_MaxMin = 0x3f3f3f3f
         self.total_cost = 0
         self.total_capacity = 0
+        self.hash_key = 0  # XOR of the Zobrist keys of the selected nodes
         self.instance = instance
 
     def add_to_solution(self, u: int, min_distance: float = -1, sum_variation: float = -1):
@@ -18,54 +58,113 @@ class Solution:
 
         Args:
           u (int): represents the ID of an element (node) that will be added to the solution.
-          min_distance (float): is an optional parameter with a default value of -1. The default
-        value -1 is used when the first candidate is added to set.
-          sum_variation (float): is an optional parameter with a default value of -1. The default
-        value -1 is used when the first candidate is added to sum all the distances from selected
-        candidate `u` to the rest of the candidates in the objective function 'of'. Then, each
-        time a new candidate is added, the `sum_variation` is received as an input representing the
-        sum of the distances from the added element `u` and the rest of the nodes in the solution.
+          min_distance (float): kept for compatibility, the minimum distance from `u` to the
+        solution is read from the incremental `min_to` vector.
+          sum_variation (float): kept for compatibility, the sum of the distances from `u` to the
+        solution is read from the incremental `sum_to` vector.
         '''
-        if sum_variation == -1 or min_distance == -1:
-            for s in self.solution_set:
-                distance_u_s = self.instance['d'][u][s]
-                self.of_MaxSum += distance_u_s
-                if self.of_MaxMin > distance_u_s:
-                    self.of_MaxMin = distance_u_s
-        else:
-            self.of_MaxSum += sum_variation
-            if self.of_MaxMin > min_distance:
-                self.of_MaxMin = min_distance
+        row = self.instance['d'][u]
+        self.of_MaxSum = round(self.of_MaxSum + self.sum_to[u], 2)
+        if self.of_MaxMin > self.min_to[u]:
+            self.of_MaxMin = self.min_to[u]
+
+        # Update the distances from every node to the solution with the new element
+        self.sum_to += row
+        # Ties are broken by node ID, as in the sorted neighbour lists of the PairIndex
+        closer = (row < self.min_to) | ((row == self.min_to) & (u < self.nearest))
+        closer[u] = False  # A node is not considered in its own minimum distance
+        second_closer = ~closer & ((row < self.min2_to)
+                                   | ((row == self.min2_to) & (u < self.second)))
+        second_closer[u] = False
+        # The previous closest node becomes the second closest one
+        self.min2_to[closer] = self.min_to[closer]
+        self.second[closer] = self.nearest[closer]
+        self.min_to[closer] = row[closer]
+        self.nearest[closer] = u
+        self.min2_to[second_closer] = row[second_closer]
+        self.second[second_closer] = u
+
         self.total_cost += self.instance['a'][u]
         self.total_capacity += self.instance['c'][u]
         self.solution_set.add(u)
+        self.selected[u] = True
+        self.hash_key ^= get_zobrist_keys(self.instance)[u]
 
     def remove_from_solution(self, u: int, min_distance: float = -1, sum_variation: float = -1):
         '''Removes an element from a solution and updates the objective function value accordingly.
 
         Args:
           u (int): represents the ID of an element (node) that will be removed from the solution.
-          min_distance (float): is an optional parameter with a default value of -1. The default
-        value -1 is used when the first candidate is added to set.
-          sum_variation (float): is an optional parameter with a default value of -1. Each time a
-        node is removed from the solution, the `ofVariation` is received as an input representing
-        the sum of the distances from the removed element `u` and the rest of the nodes in the
-        solution.
+          min_distance (float): kept for compatibility, the minimum distance from `u` to the
+        solution is read from the incremental `min_to` vector.
+          sum_variation (float): kept for compatibility, the sum of the distances from `u` to the
+        solution is read from the incremental `sum_to` vector.
         '''
         self.solution_set.remove(u)
-        if sum_variation == -1 or min_distance == -1:
-            for s in self.solution_set:
-                distance_u_s = self.instance['d'][u][s]
-                self.of_MaxSum -= distance_u_s
-                if self.of_MaxMin == distance_u_s:
-                    self.of_MaxMin = self.minimum_distance_in_solution()
-        else:
-            self.of_MaxSum -= sum_variation
-            if self.of_MaxMin == min_distance:
-                self.of_MaxMin = self.minimum_distance_in_solution()
+        self.selected[u] = False
+        self.hash_key ^= get_zobrist_keys(self.instance)[u]
+        row = self.instance['d'][u]
+        self.sum_to -= row
+        self.of_MaxSum = round(self.of_MaxSum - self.sum_to[u], 2)
+
+        # The second closest node of the nodes whose closest one was `u` becomes the closest one
+        closest_removed = self.nearest == u
+        self.min_to[closest_removed] = self.min2_to[closest_removed]
+        self.nearest[closest_removed] = self.second[closest_removed]
+        # Only those nodes and the ones whose second closest node was `u` need a new second
+        self._update_second_distances(np.flatnonzero(closest_removed | (self.second == u)))
+
+        # MaxMin only changes if `u` is an endpoint of the closest pair in the solution
+        if self.of_MaxMin == self.min_to[u]:
+            self.of_MaxMin = self.minimum_distance_in_solution()
+
         self.total_cost -= self.instance['a'][u]
         self.total_capacity -= self.instance['c'][u]
 
+    def _update_second_distances(self, nodes: np.ndarray):
+        '''Recomputes the second closest selected node (and its distance) for each node in `nodes`,
+        whose closest selected node in `nearest` is already up to date. In large solutions, the
+        second closest node is the next selected node after the closest one in the sorted neighbour
+        list of the PairIndex (built the first time it is needed, if `use_pair_index` allows it),
+        so the lists are scanned from that position (which is close to it while most of the nodes
+        are selected, e.g. in a deconstruction). Otherwise, the distances to every selected node
+        are checked.
+
+        Args:
+          nodes (np.ndarray): IDs of the nodes whose second closest node has to be recomputed.
+        '''
+        if len(nodes) == 0:
+            return
+        self.min2_to[nodes] = 0x3f3f3f3f
+        self.second[nodes] = -1
+        nodes = nodes[self.nearest[nodes] != -1]
+        n_selected = len(self.solution_set)
+        if len(nodes) == 0 or n_selected < 2:
+            return
+
+        n = self.instance['n']
+        # Scanning the lists reads about n / n_selected positions per node, and checking every
+        # selected node reads n_selected, so the lists are only used in large solutions
+        if n_selected * n_selected > SCAN_FACTOR * n and use_pair_index(self.instance):
+            index = get_pair_index(self.instance)
+            start = index.position(nodes, self.nearest[nodes], self.min_to[nodes]) + 1
+            window = max(8, 4 * n // n_selected)
+            found = index.next_in(nodes, start, self.selected, window)
+            in_list = found < n - 1
+            nodes, found = nodes[in_list], found[in_list]
+            self.min2_to[nodes] = index.neighbour_d[nodes, found]
+            self.second[nodes] = index.neighbours[nodes, found]
+            return
+
+        selected = np.flatnonzero(self.selected)
+        distances = np.array(self.instance['d'][np.ix_(nodes, selected)], dtype=np.float64)
+        # Skip each node itself and its closest selected node
+        distances[nodes[:, None] == selected[None, :]] = 0x3f3f3f3f
+        distances[self.nearest[nodes][:, None] == selected[None, :]] = 0x3f3f3f3f
+        closest = distances.argmin(axis=1)
+        self.min2_to[nodes] = distances[np.arange(len(nodes)), closest]
+        self.second[nodes] = np.where(self.min2_to[nodes] < 0x3f3f3f3f, selected[closest], -1)
+
     def contains(self, u: int) -> bool:
         '''Checks if a given candidate ID `u` is present in the current solution attribute
         `solution_set`.
@@ -77,7 +176,7 @@ class Solution:
           (bool): indicates whether the variable `u` is present in the 'sol' key of the dictionary
         `sol`.
         '''
-        return u in self.solution_set
+        return bool(self.selected[u])
 
     def distance_sum_to_solution(self, u: int, without: list = [-1]) -> float:
         '''Calculates the sum of the distances from a given node to the rest of the nodes in the
@@ -95,11 +194,11 @@ class Solution:
           (float): returns the sum of the distances from a given node `u` to the rest of the nodes
         in solution `sol`, excluding the distance to a specific node `without` if provided.
         '''
-        d = 0
-        for s in self.solution_set:
-            if s not in without:
-                d += self.instance['d'][s][u]
-        return round(d, 2)
+        d = self.sum_to[u]
+        for s in without:
+            if s != -1 and self.selected[s]:
+                d -= self.instance['d'][s, u]
+        return round(float(d), 2)
 
     def minimum_distance_to_solution(self, u: int, without: list = [-1]) -> float:
         '''Calculates the minimum distance from a given node to the rest of the nodes in the
@@ -117,13 +216,19 @@ class Solution:
           (float): returns the minimum distance value from a given node `u` to the rest of the
         nodes in solution `sol`, excluding the distance to a specific node `without` if provided.
         '''
-        min_d = 0x3f3f3f3f
-        for s in self.solution_set:
-            if s not in without and s != u:
-                d = self.instance['d'][s][u]
-                if d < min_d:
-                    min_d = d
-        return round(min_d, 2)
+        # Skip the excluded nodes among the two closest ones, rescan only if both are excluded
+        if self.nearest[u] == -1 or self.nearest[u] not in without:
+            min_d = self.min_to[u]
+        elif self.second[u] == -1 or self.second[u] not in without:
+            min_d = self.min2_to[u]
+        else:
+            excluded = [s for s in without if s != -1 and self.selected[s]]
+            mask = self.selected.copy()
+            mask[excluded] = False
+            mask[u] = False
+            others = np.flatnonzero(mask)
+            min_d = self.instance['d'][u, others].min() if len(others) > 0 else 0x3f3f3f3f
+        return round(float(min_d), 2)
 
     def minimum_distance_in_solution(self):
         '''
@@ -133,12 +238,22 @@ class Solution:
           (float): the minimum pairwise distance between the nodes in the solution set, rounded to
         two decimal places.
         '''
-        min_d = 0x3f3f3f3f
-        for s in self.solution_set:
-            d = self.minimum_distance_to_solution(s)
-            if d < min_d:
-                min_d = d
-        return round(min_d, 2)
+        if not self.selected.any():
+            return 0x3f3f3f3f
+        return round(float(self.min_to[self.selected].min()), 2)
+
+    def snapshot(self) -> 'SolutionSnapshot':
+        '''Takes an immutable copy of the selected nodes and objective values of the solution,
+        without copying the instance or the per-node vectors. The nodes are kept in the iteration
+        order of `solution_set`, so the rebuilt solution iterates them in the same order (as a deep
+        copy of the solution would).
+
+        Returns:
+          (SolutionSnapshot): the state of the solution at this moment.
+        '''
+        nodes = np.fromiter(self.solution_set, dtype=np.intp, count=len(self.solution_set))
+        return SolutionSnapshot(self.instance, nodes, self.of_MaxSum, self.of_MaxMin,
+                                self.total_cost, self.total_capacity, self.hash_key)
 
     def is_feasible(self) -> float:
         '''Checks if a solution has at least 2 nodes.
@@ -197,3 +312,56 @@ class Solution:
                 possible_capacity += self.instance['c'][q]
 
         return possible_capacity > self.instance['B']
+
+
+class SolutionSnapshot:
+    '''Immutable record of a solution: its selected nodes (as an array in the iteration order of
+    the `solution_set` they were taken from), objective values, cost, capacity and hash. The
+    instance is shared by reference, so taking a snapshot costs O(n) instead of copying the distance
+    matrix. A live `Solution` is only rebuilt with `to_solution` for the snapshots that are going to
+    be modified (e.g. by the local search).'''
+    __slots__ = ('instance', 'nodes', 'of_MaxSum', 'of_MaxMin', 'total_cost', 'total_capacity',
+                 'hash_key')
+
+    def __init__(self, instance: dict, nodes: np.ndarray, of_MaxSum: float, of_MaxMin: float,
+                 total_cost: int, total_capacity: int, hash_key: int = None):
+        '''Initialize SolutionSnapshot'''
+        nodes = np.array(nodes, dtype=np.intp)
+        nodes.flags.writeable = False
+        if hash_key is None:  # Zobrist hash of the nodes, as in a Solution
+            keys = get_zobrist_keys(instance)
+            hash_key = 0
+            for u in nodes.tolist():
+                hash_key ^= keys[u]
+        for name, value in zip(self.__slots__, (instance, nodes, of_MaxSum, of_MaxMin,
+                                                total_cost, total_capacity, hash_key)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('SolutionSnapshot is immutable')
+
+    def __reduce__(self):
+        # The instance is not pickled, so snapshots sent between processes only carry their own
+        # data (their `instance` is None on the receiving side)
+        return (SolutionSnapshot, (None, self.nodes, self.of_MaxSum, self.of_MaxMin,
+                                   self.total_cost, self.total_capacity, self.hash_key))
+
+    @property
+    def solution_set(self) -> frozenset:
+        '''IDs of the selected nodes, as the `solution_set` of a Solution.'''
+        return frozenset(self.nodes.tolist())
+
+    def to_solution(self) -> Solution:
+        '''Rebuilds a live Solution with the selected nodes of the snapshot. The objective values
+        are the ones recorded in the snapshot, so the solution continues exactly where it was
+        taken.
+
+        Returns:
+          (Solution): a new solution with the same nodes and objective values.
+        '''
+        sol = Solution(self.instance)
+        for u in self.nodes.tolist():
+            sol.add_to_solution(u)
+        sol.of_MaxSum = self.of_MaxSum
+        sol.of_MaxMin = self.of_MaxMin
+        return sol
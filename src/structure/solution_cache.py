@@ -0,0 +1,51 @@
+'''Auxiliar class to memoize the local search results of repeated solutions'''
+from collections import OrderedDict
+
+import numpy as np
+
+from structure.solution import SolutionSnapshot
+
+
+class SolutionCache:
+    '''Bounded map from a starting solution to the solution obtained by improving it. Solutions are
+    looked up by their Zobrist hash (`hash_key`), and their selected nodes are compared to rule out
+    hash collisions. The nodes are compared in order, because the exchanges chosen by the local
+    search may depend on the iteration order of the selected set, so a hit always returns the
+    result the local search would obtain. When the map is full, the least recently used entry is
+    discarded.'''
+    def __init__(self, max_size: int):
+        '''Initialize SolutionCache'''
+        self.max_size = max_size
+        self._entries = OrderedDict()  # Hash -> (starting nodes, improved snapshot)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, start: SolutionSnapshot) -> SolutionSnapshot:
+        '''Looks up the improved solution of a starting solution.
+
+        Args:
+          start (SolutionSnapshot): starting solution.
+
+        Returns:
+          (SolutionSnapshot): the improved solution, or `None` if it is not in the cache.
+        '''
+        entry = self._entries.get(start.hash_key)
+        if entry is None or not np.array_equal(entry[0], start.nodes):
+            return None
+        self._entries.move_to_end(start.hash_key)
+        return entry[1]
+
+    def put(self, start: SolutionSnapshot, improved: SolutionSnapshot):
+        '''Saves the improved solution of a starting solution.
+
+        Args:
+          start (SolutionSnapshot): starting solution.
+          improved (SolutionSnapshot): solution obtained by improving `start`.
+        '''
+        if self.max_size <= 0:
+            return
+        self._entries[start.hash_key] = (start.nodes, improved)
+        self._entries.move_to_end(start.hash_key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
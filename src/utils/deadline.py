@@ -0,0 +1,47 @@
+'''Auxiliar class to stop long procedures cooperatively'''
+import math
+import time
+
+
+class Deadline:
+    '''Time limit checked cooperatively by long loops (e.g. the local search). The monotonic clock
+    is only read once every `check_every` calls to `expired`, so checking the deadline in the
+    innermost loops has a negligible cost. Once expired, it stays expired.'''
+    def __init__(self, seconds: float = None, check_every: int = 64):
+        '''Initialize Deadline'''
+        self.end = math.inf if seconds is None else time.monotonic() + seconds
+        self.check_every = check_every
+        self._calls = 0
+        self._expired = False
+
+    def expired(self, force: bool = False) -> bool:
+        '''Checks if the time limit has been reached.
+
+        Args:
+          force (bool): if `True`, the clock is read in this call (e.g. once per local search
+        move), otherwise only once every `check_every` calls.
+
+        Returns:
+          (bool): `True` if the time limit has been reached, and `False` otherwise.
+        '''
+        if self._expired:
+            return True
+        self._calls += 1
+        if force or self._calls >= self.check_every:
+            self._calls = 0
+            self._expired = time.monotonic() >= self.end
+        return self._expired
+
+    def limit(self, seconds: float = None) -> 'Deadline':
+        '''Creates a deadline that expires after `seconds` or with this one, whichever is first.
+
+        Args:
+          seconds (float): time limit of the new deadline. If it is not provided, the new deadline
+        only expires with this one.
+
+        Returns:
+          (Deadline): the new deadline.
+        '''
+        deadline = Deadline(check_every=self.check_every)
+        deadline.end = self.end if seconds is None else min(self.end, time.monotonic() + seconds)
+        return deadline
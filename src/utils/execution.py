@@ -1,11 +1,19 @@
 '''Directory and instance execution auxiliar functions'''
+import contextlib
 import datetime
+import itertools
 import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 
 from algorithms import grasp
-from structure import instance, dominance
+from structure import instance_cache
+from structure.archive import ParetoArchive
+from structure.solution_cache import SolutionCache
 
+from utils.deadline import Deadline
 from utils.results import OutputHandler
 from utils.logger import load_logger
 
@@ -28,62 +36,101 @@ def execute_instance(path: str, config: dict, results: OutputHandler) -> float:
     Returns:
       (float): returns the total execution time in seconds.
     '''
-    # Initialize list and table to save solutions
-    all_c_solutions = []  # Solutions from construction stage
-    all_solutions = []  # Final solutions after the LS stage
+    # Initialize archive and tables to save solutions
+    archive = ParetoArchive()  # Non-dominated solutions after the LS stage, updated in each IT
+    n_solutions = 0
     c_result_table = pd.DataFrame(columns=['Solution', 'MaxSum', 'MaxMin', 'Cost', 'Capacity'])
     result_table = pd.DataFrame(columns=['Solution', 'MaxSum', 'MaxMin', 'Cost', 'Capacity'])
+    stats = {}  # Local search statistics
 
     print('Solving instance %s:', path)
-    # Read instance
-    inst = instance.read_instance(path)
+    workers = config.get('workers', 1)
+    if workers > 1:
+        # Each worker loads its own instance, so this process only fills the binary cache (if it
+        # is enabled) before starting them, without keeping the instance
+        if config.get('instance_storage', {}).get('cache'):
+            _load_instance(path, config)
+    else:
+        inst = _load_instance(path, config)
 
     max_time = config.get('execution_limits').get('max_time')
     start = datetime.datetime.now()
-    # Construct a solution for the IT defined in config
-    for i in range(config.get('iterations')):
-        # If time is exceeded stop execution
-        if datetime.timedelta(seconds=max_time) < datetime.datetime.now() - start:
-            print('Maximum allowed execution time is exceeded. Total IT: %s', i)
-            break
-
-        # Define objective considered in this IT
-        construction_approach = config.get('mo_approach_C')
-        objective = i % 2  # 0: MaxSum, 1: MaxMin (for default AltBwC approach)
-
-        # Check if a single objective approach have been defined
-        if construction_approach == 'MaxSum':
-            objective = 0
-        elif construction_approach == 'MaxMin':
-            objective = 1
-
-        # Run B-GRASP-VND
-        print(f'Finding solution #{i+1}')
-        c_sol_list, solution_list = grasp.execute(inst, config, objective, i)
-        # Save solution set found in this IT
-        all_c_solutions += c_sol_list
-        all_solutions += solution_list
-
-        # Add new solutions to result_table
-        # for sol in solution_list:
-        for c_sol in c_sol_list:
-            selected_nodes = ' - '.join([str(s) for s in sorted(c_sol.solution_set)])
-            c_result_table.loc[len(c_result_table)] = [selected_nodes] + [c_sol.of_MaxSum,
-                                                                      c_sol.of_MaxMin,
-                                                                      c_sol.total_cost,
-                                                                      c_sol.total_capacity]
-
-        # Add new solutions to result_table
-        for sol in solution_list:
-            selected_nodes = ' - '.join([str(s) for s in sorted(sol.solution_set)])
-            result_table.loc[len(result_table)] = [selected_nodes] + [sol.of_MaxSum,
-                                                                      sol.of_MaxMin,
-                                                                      sol.total_cost,
-                                                                      sol.total_capacity]
-
-    # Find non-dominated solutions among all constructions
-    is_non_dominated = dominance.get_nondominated_solutions(all_solutions)
-    dom_result_table = result_table[is_non_dominated].reset_index(drop=True)
+    deadline = start + datetime.timedelta(seconds=max_time)
+    # Each IT has its own seed, so results do not depend on the number of workers
+    iterations = config.get('iterations')
+    seeds = [random.getrandbits(32) for _ in range(iterations)]
+    # Local optima of the repeated constructions (each worker process keeps its own cache)
+    cache = _create_cache(config)
+
+    with contextlib.ExitStack() as stack:
+        if workers > 1:
+            # Each worker loads the instance once (memory-mapped if the cache is enabled)
+            pool = stack.enter_context(ProcessPoolExecutor(workers, initializer=_load_worker,
+                                                           initargs=(path, config)))
+            outputs = pool.map(_execute_worker_iteration, itertools.repeat(config),
+                               range(iterations), seeds, itertools.repeat(deadline))
+        else:
+            outputs = (execute_iteration(inst, config, i, seeds[i], deadline, cache)
+                       for i in range(iterations))
+
+        # Construct a solution for the IT defined in config (merged in IT order)
+        for i, output in enumerate(outputs):
+            # If time is exceeded stop execution
+            if output is None:
+                print('Maximum allowed execution time is exceeded. Total IT: %s', i)
+                break
+            c_sol_list, solution_list, it_stats = output
+            for key, value in it_stats.items():
+                stats[key] = stats.get(key, 0) + value
+
+            # Update the Pareto front with the solution set found in this IT
+            for sol in solution_list:
+                archive.add(sol)
+            n_solutions += len(solution_list)
+            print(f'Pareto archive with {len(archive)} non-dominated solutions out of '
+                  f'{n_solutions}.')
+
+            # Add new solutions to result_table
+            # for sol in solution_list:
+            for c_sol in c_sol_list:
+                selected_nodes = ' - '.join([str(s) for s in sorted(c_sol.solution_set)])
+                c_result_table.loc[len(c_result_table)] = [selected_nodes] + [c_sol.of_MaxSum,
+                                                                          c_sol.of_MaxMin,
+                                                                          c_sol.total_cost,
+                                                                          c_sol.total_capacity]
+
+            # Add new solutions to result_table
+            for sol in solution_list:
+                selected_nodes = ' - '.join([str(s) for s in sorted(sol.solution_set)])
+                result_table.loc[len(result_table)] = [selected_nodes] + [sol.of_MaxSum,
+                                                                          sol.of_MaxMin,
+                                                                          sol.total_cost,
+                                                                          sol.total_capacity]
+
+    # Report the effect of the bounds in each neighborhood of the local search
+    for key in sorted(stats):
+        if key.startswith('pruned_'):
+            neighborhood = key[len('pruned_'):]
+            total = stats[key] + stats.get(f'evaluated_{neighborhood}', 0)
+            if total > 0:
+                print(f'Neighbourhood {neighborhood}: {stats[key]} of {total} exchanges skipped '
+                      f'by bounds ({round(100 * stats[key] / total, 2)} %).')
+    if stats.get('ls_timeouts'):
+        print(f"Local search time limit reached in {stats['ls_timeouts']} of {stats['ls_runs']} "
+              'runs.')
+    if stats.get('ls_it_timeouts'):
+        print(f"Local search iteration time limit reached {stats['ls_it_timeouts']} times.")
+    lookups = stats.get('ls_cache_hits', 0) + stats.get('ls_cache_misses', 0)
+    if lookups > 0:
+        stats['ls_cache_hit_rate'] = round(100 * stats.get('ls_cache_hits', 0) / lookups, 2)
+        print(f"Local search skipped for {stats.get('ls_cache_hits', 0)} of {lookups} "
+              f"constructions ({stats['ls_cache_hit_rate']} %) with memoized results.")
+
+    # Non-dominated solutions among all constructions, sorted by MaxSum
+    dom_result_table = pd.DataFrame(
+        [[' - '.join([str(s) for s in sorted(sol.solution_set)]), sol.of_MaxSum, sol.of_MaxMin,
+          sol.total_cost, sol.total_capacity] for sol in archive],
+        columns=['Solution', 'MaxSum', 'MaxMin', 'Cost', 'Capacity'])
 
     # Compute execution time
     elapsed = datetime.datetime.now() - start
@@ -91,25 +138,113 @@ def execute_instance(path: str, config: dict, results: OutputHandler) -> float:
     print('Execution time: %s', secs)
     add_data = {
         'time': [secs],
-        'all_sols': [len(all_solutions)],
+        'all_sols': [n_solutions],
         'nd_sols': [len(dom_result_table)]
     }
+    add_data.update({key: [value] for key, value in sorted(stats.items())})
 
     # Build and plot Pareto Front
     fig = results.pareto_front(dom_result_table, path)
     # Save table and plot with results
-    algorithm_params = (f'IT{config.get("iterations")}'
-                        f'_b{config.get("parameters").get("beta")}'
-                        f'_{config.get("scheme")[:3]}'
-                        # f'_nb{len(config.get("neighborhoods"))}'
-                        ).replace('.', '')
+    algorithm_params = get_algorithm_params(config)
     results.save(dom_result_table, result_table, c_result_table, add_data, fig, algorithm_params, path)
 
 
+def get_algorithm_params(config: dict) -> str:
+    '''
+    Builds the parameter tag of a configuration used to name its output directory.
+
+    Args:
+      config (dict): contains the configuration settings for the algorithm.
+
+    Returns:
+      (str): parameter configuration tag (iterations, beta and LS scheme, or PLS for the Pareto
+    Local Search, which does not use a scheme).
+    '''
+    scheme = 'PLS' if config.get('strategy') == 'PLS' else config.get('scheme')[:3]
+    return (f'IT{config.get("iterations")}'
+            f'_b{config.get("parameters").get("beta")}'
+            f'_{scheme}'
+            # f'_nb{len(config.get("neighborhoods"))}'
+            ).replace('.', '')
+
+
+def execute_iteration(inst: dict, config: dict, iteration: int, seed: int,
+                      deadline: datetime.datetime, cache: SolutionCache = None):
+    '''
+    Runs a single GRASP iteration (construction and local search) with its own random seed.
+
+    Args:
+      inst (dict): contains the instance data.
+      config (dict): contains the configuration settings for the algorithm.
+      iteration (int): number of the iteration, which defines its objective and construction.
+      seed (int): seed of the random number generator for this iteration.
+      deadline (datetime.datetime): moment after which no new iteration is started.
+      cache (SolutionCache): optional memo of the local search results, shared by the iterations.
+
+    Returns:
+      (tuple): the construction and local search solution lists returned by `grasp.execute`, and
+    the local search statistics of the iteration, or `None` if the deadline has been exceeded.
+    '''
+    # If time is exceeded, skip the iteration
+    if datetime.datetime.now() > deadline:
+        return None
+
+    # Define objective considered in this IT
+    construction_approach = config.get('mo_approach_C')
+    objective = iteration % 2  # 0: MaxSum, 1: MaxMin (for default AltBwC approach)
+
+    # Check if a single objective approach have been defined
+    if construction_approach == 'MaxSum':
+        objective = 0
+    elif construction_approach == 'MaxMin':
+        objective = 1
+
+    # Run B-GRASP-VND (the local search is also stopped when the time is exceeded)
+    print(f'Finding solution #{iteration+1}')
+    random.seed(seed)
+    stats = {}
+    time_left = Deadline((deadline - datetime.datetime.now()).total_seconds())
+    c_sol_list, solution_list = grasp.execute(inst, config, objective, iteration, stats,
+                                              time_left, cache)
+    return c_sol_list, solution_list, stats
+
+
+def _load_instance(path: str, config: dict) -> dict:
+    '''Reads an instance with the storage options of the config (binary cache and distances).'''
+    storage = config.get('instance_storage', {})
+    return instance_cache.load_instance(path, storage.get('cache'),
+                                        storage.get('distances', 'Dense'))
+
+
+def _create_cache(config: dict) -> SolutionCache:
+    '''Creates the memo of local search results (`None` if 'ls_cache_size' is not positive).'''
+    size = config.get('ls_cache_size', 0)
+    return SolutionCache(size) if size > 0 else None
+
+
+_worker_instance = None  # Instance solved by the current worker process
+_worker_cache = None  # Local search results memoized by the current worker process
+
+
+def _load_worker(path: str, config: dict):
+    '''Loads the instance once in each worker process.'''
+    global _worker_instance, _worker_cache
+    _worker_instance = _load_instance(path, config)
+    _worker_cache = _create_cache(config)
+
+
+def _execute_worker_iteration(config: dict, iteration: int, seed: int,
+                              deadline: datetime.datetime):
+    '''Runs `execute_iteration` on the instance loaded by the worker process.'''
+    return execute_iteration(_worker_instance, config, iteration, seed, deadline, _worker_cache)
+
+
 def execute_directory(directory: str, config: dict):
     '''
     Scans a directory for text files, executes instances with specified configurations, and saves
-    the results in a CSV file.
+    the results in a CSV file. If `instance_workers` is higher than 1 in the config, the instances
+    are solved in parallel by a pool of processes.
 
     Args:
       directory (str): represents the path to the directory where the files (instances) are located.
@@ -118,8 +253,23 @@ def execute_directory(directory: str, config: dict):
     with os.scandir(directory) as files:
         ficheros = [file.name for file in files if file.is_file() and file.name.endswith(".txt")]
 
-    results = OutputHandler()
+    results = OutputHandler(get_algorithm_params(config))
+
+    # Each instance has its own seed, so results do not depend on the number of workers
+    paths = [os.path.join(directory, f) for f in ficheros]
+    seeds = [random.getrandbits(32) for _ in paths]
+    instance_workers = config.get('instance_workers', 1)
+    if instance_workers > 1:
+        with ProcessPoolExecutor(instance_workers) as pool:
+            list(pool.map(execute_seeded_instance, paths, itertools.repeat(config),
+                          itertools.repeat(results), seeds))
+    else:
+        for path, seed in zip(paths, seeds):
+            execute_seeded_instance(path, config, results, seed)
+    OutputHandler.release_execution_numbers()
+
 
-    for f in ficheros:
-        path = os.path.join(directory, f)
-        execute_instance(path, config, results)
+def execute_seeded_instance(path: str, config: dict, results: OutputHandler, seed: int):
+    '''Runs `execute_instance` after seeding the random number generator with `seed`.'''
+    random.seed(seed)
+    execute_instance(path, config, results)
@@ -1,5 +1,9 @@
 '''Class to handle result plotting and saving'''
+import contextlib
 import os
+import time
+import uuid
+
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -7,11 +11,13 @@ import plotly.graph_objects as go
 
 class OutputHandler:
     '''Class to handle result plotting and saving'''
-    def __init__(self):
+    _claims = []  # Execution number files claimed by this process
+
+    def __init__(self, params: str = ''):
         '''Initialize OutputHandler'''
         self.execution_n = -1
         # TODO add boolean input for PLOT
-        self._get_execution_number()
+        self._get_execution_number(params)
 
     def pareto_front(self, table: pd.DataFrame, instance: str) -> go.Figure:
         '''
@@ -44,12 +50,7 @@ class OutputHandler:
           params (str): parameter configuration used in the optimization algorithm.
           instance (str): represents the name or path of a specific file (instance).
         '''
-        instance_path = instance.split(os.sep)[1:]
-        instance_path = [s.replace('.txt', '') for s in instance_path]
-        output_path = os.path.join('output',
-                                   f'B-GRASP_{params}',
-                                   *instance_path)
-
+        output_path = self.get_output_path(params, instance)
         os.makedirs(output_path, exist_ok=True)
 
         # c_sols.to_csv(os.path.join(output_path,
@@ -60,45 +61,127 @@ class OutputHandler:
         #                           f'resultsAll_{self.execution_n}.csv'),
         #              index=False)
 
-        table.to_csv(os.path.join(output_path,
-                                  f'results_{self.execution_n}.csv'),
-                     index=False)
+        _write_csv(table, os.path.join(output_path, f'results_{self.execution_n}.csv'))
 
         self._save_execution_add_data(add_data, output_path)
 
         # figure.write_html(os.path.join(output_path,
         #                                f'solution_{self.execution_n}.html'))
 
-    def _get_execution_number(self):
+    @staticmethod
+    def get_output_path(params: str, instance: str) -> str:
         '''
-        The function reads an execution number from a file, increments it by 1, and writes the
-        updated number back to the file.
+        Builds the directory where the results of an instance are saved.
+
+        Args:
+          params (str): parameter configuration used in the optimization algorithm.
+          instance (str): represents the name or path of a specific file (instance).
+
+        Returns:
+          (str): path to the output directory of the instance.
         '''
-        execution_file = os.path.join('temp', 'execution.txt')
-
-        if os.path.exists(execution_file):
-            with open(execution_file, 'r+') as file:
-                self.execution_n = file.read()
-                file.seek(0)
-                file.write(str(int(self.execution_n) + 1))
-                file.truncate()
-        else:
-            self.execution_n = 1
-            os.makedirs('temp', exist_ok=True)
-            with open(execution_file, 'w') as file:
-                file.write(str(int(self.execution_n) + 1))
+        instance_path = instance.split(os.sep)[1:]
+        instance_path = [s.replace('.txt', '') for s in instance_path]
+        return os.path.join('output', f'B-GRASP_{params}', *instance_path)
+
+    def _get_execution_number(self, params: str):
+        '''
+        The function claims the lowest execution number of a parameter configuration that is not
+        in use. Each number is claimed by creating its own file in `temp/executions/<params>` with
+        an exclusive create, which is atomic, so processes started at the same time always get
+        different numbers.
+
+        Args:
+          params (str): parameter configuration tag, which defines the output directory (and the
+        execution numbers) of the results.
+        '''
+        executions_dir = os.path.join('temp', 'executions', f'B-GRASP_{params}')
+        os.makedirs(executions_dir, exist_ok=True)
+
+        execution_n = 1
+        while True:
+            claim = os.path.join(executions_dir, str(execution_n))
+            try:
+                fd = os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                execution_n += 1
+                continue
+            os.close(fd)
+            OutputHandler._claims.append(claim)
+            self.execution_n = execution_n
+            return
+
+    @staticmethod
+    def release_execution_numbers():
+        '''
+        The function releases the execution numbers claimed by this process, so they can be used
+        by the next executions. Numbers claimed by other processes (e.g. another run that is still
+        going) are kept.
+        '''
+        for claim in OutputHandler._claims:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(claim)
+        OutputHandler._claims.clear()
 
     def _save_execution_add_data(self, add_data: dict, path: str):
         '''
-        The function saves algorithm's execution time `secs` in seconds in a csv file.
+        The function saves algorithm's execution time `secs` in seconds in a csv file. The file
+        is shared by every execution of the instance, so it is updated under a lock.
         '''
         time_file = os.path.join(path, 'add_data.csv')
         new_row = {'ex_number': [self.execution_n]}
         new_row.update(add_data)
-        if os.path.exists(time_file):
-            time_table = pd.read_csv(time_file)
-            time_table = time_table.append(pd.DataFrame(new_row))
-        else:
-            time_table = pd.DataFrame(new_row)
-
-        time_table.to_csv(time_file, index=False)
+        with _file_lock(f'{time_file}.lock'):
+            if os.path.exists(time_file):
+                time_table = pd.read_csv(time_file)
+                time_table = pd.concat([time_table, pd.DataFrame(new_row)], ignore_index=True)
+            else:
+                time_table = pd.DataFrame(new_row)
+
+            _write_csv(time_table, time_file)
+
+
+def _write_csv(table: pd.DataFrame, path: str):
+    '''
+    Writes a DataFrame to a CSV file through a temporary file and an atomic replace, so readers
+    never see a partially written file.
+
+    Args:
+      table (pd.DataFrame): data to be saved.
+      path (str): path to the CSV file.
+    '''
+    tmp_file = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        table.to_csv(tmp_file, index=False)
+        os.replace(tmp_file, path)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+@contextlib.contextmanager
+def _file_lock(lock_file: str, timeout: float = 60):
+    '''
+    Inter-process lock based on the exclusive creation of `lock_file`. A lock older than
+    `timeout` seconds is considered abandoned (e.g. by a killed process) and is broken.
+
+    Args:
+      lock_file (str): path of the lock file.
+      timeout (float): maximum time (in seconds) a lock can be held.
+    '''
+    while True:
+        try:
+            fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_file) > timeout:
+                    os.remove(lock_file)
+            except OSError:
+                pass  # Released in the meantime
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_file)
@@ -0,0 +1,141 @@
+'''Auxiliar functions to schedule the executions of several configurations and instances'''
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils import execution
+from utils.results import OutputHandler
+from utils.logger import load_logger
+
+logging = load_logger(__name__)
+
+
+def run(directory: str, config_list: list, workers: int = 1):
+    '''
+    Solves every instance of a directory with every configuration, as many times as experiments
+    each configuration defines. All the executions are expanded into a task list and dispatched to
+    a pool of `workers` processes longest first (LPT), so the longest executions never start last
+    while the rest of the workers sit idle.
+
+    Args:
+      directory (str): represents the path to the directory where the files (instances) are located.
+      config_list (list): configuration settings to be executed.
+      workers (int): number of processes solving tasks in parallel.
+    '''
+    tasks = build_tasks(directory, config_list)
+    tasks.sort(key=lambda task: task['cost'], reverse=True)
+    print(f'Scheduled {len(tasks)} executions over {workers} workers.')
+
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            # Idle workers take the next task of the queue, which is the longest one left
+            futures = [pool.submit(execution.execute_seeded_instance, task['path'],
+                                   task['config'], task['results'], task['seed'])
+                       for task in tasks]
+            for future in futures:
+                future.result()
+    else:
+        for task in tasks:
+            execution.execute_seeded_instance(task['path'], task['config'], task['results'],
+                                              task['seed'])
+    # Next runs can reuse the execution numbers of this one
+    OutputHandler.release_execution_numbers()
+
+
+def build_tasks(directory: str, config_list: list) -> list:
+    '''
+    Expands the configurations, their experiments and the instance files of a directory into a
+    list of tasks. Execution numbers (counted per parameter configuration) and seeds are assigned
+    in this (natural) order, so results do not depend on the order the tasks are executed in.
+
+    Args:
+      directory (str): represents the path to the directory where the files (instances) are located.
+      config_list (list): configuration settings to be executed.
+
+    Returns:
+      (list of dict): tasks with the `config`, instance `path`, `results` handler, random `seed`
+    and estimated `cost` of each execution.
+    '''
+    with os.scandir(directory) as files:
+        ficheros = sorted(file.name for file in files
+                          if file.is_file() and file.name.endswith(".txt"))
+    paths = [os.path.join(directory, f) for f in ficheros]
+    sizes = {path: read_instance_size(path) for path in paths}
+
+    tasks = []
+    for config in config_list:
+        for _ in range(config.get('experiments')):
+            results = OutputHandler(execution.get_algorithm_params(config))
+            for path in paths:
+                tasks.append({'config': config,
+                              'path': path,
+                              'results': results,
+                              'seed': random.getrandbits(32)})
+
+    estimate_costs(tasks, sizes)
+    return tasks
+
+
+def estimate_costs(tasks: list, sizes: dict):
+    '''
+    Estimates the execution time of each task. Tasks whose instance and configuration have been
+    executed before take their mean time in `add_data.csv`. The rest are estimated from the
+    instance size as `iterations * n^2.5` (the local search evaluates O(n^2) exchanges per move),
+    scaled to seconds with the executed tasks and limited by `max_time`.
+
+    Args:
+      tasks (list of dict): tasks built by `build_tasks`, updated with their `cost`.
+      sizes (dict): number of nodes of each instance path.
+    '''
+    ratios = []
+    for task in tasks:
+        config = task['config']
+        task['units'] = config.get('iterations') * sizes[task['path']] ** 2.5
+        task['cost'] = read_past_time(task['path'], config)
+        if task['cost'] is not None:
+            ratios.append(task['cost'] / task['units'])
+
+    scale = statistics.median(ratios) if ratios else None
+    for task in tasks:
+        if task['cost'] is None:
+            if scale is None:  # Nothing has been executed yet, only relative costs are known
+                task['cost'] = task['units']
+            else:
+                max_time = task['config'].get('execution_limits').get('max_time')
+                task['cost'] = min(task['units'] * scale, max_time)
+
+
+def read_instance_size(path: str) -> int:
+    '''
+    Reads the number of nodes of an instance from the first line of its file.
+
+    Args:
+      path (str): file path to the instance file.
+
+    Returns:
+      (int): number of nodes `n` of the instance.
+    '''
+    with open(path, 'r') as f:
+        return int(f.readline().split()[0])
+
+
+def read_past_time(path: str, config: dict) -> float:
+    '''
+    Reads the mean execution time of previous executions of an instance with a configuration.
+
+    Args:
+      path (str): file path to the instance file.
+      config (dict): contains the configuration settings for the algorithm.
+
+    Returns:
+      (float): mean time in seconds, or `None` if the instance has not been executed yet.
+    '''
+    output_path = OutputHandler.get_output_path(execution.get_algorithm_params(config), path)
+    time_file = os.path.join(output_path, 'add_data.csv')
+    if not os.path.exists(time_file):
+        return None
+    times = pd.read_csv(time_file)['time']
+    return float(times.mean()) if len(times) > 0 else None
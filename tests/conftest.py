@@ -0,0 +1,28 @@
+'''Shared fixtures of the tests'''
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The modules are imported as in src/main.py, from the source directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+
+@pytest.fixture
+def write_instance(tmp_path):
+    '''Writes a random instance in the text format read by `read_instance`. The distances are
+    drawn from a few values, so ties between the distances of a node are frequent.'''
+    def write(n: int, seed: int, values: int = 6) -> str:
+        rng = np.random.default_rng(seed)
+        lines = [str(n)]
+        for u in range(n):
+            for v in range(u + 1, n):
+                lines.append(f'{u + 1} {v + 1} {rng.integers(1, values + 1) * 1.25}')
+        for u in range(n):
+            lines.append(f'{u + 1} {rng.integers(1, 20)} 0 {rng.integers(1, 20)}')
+        lines.append(f'{10 * n} 0 {n}')
+        path = tmp_path / f'instance_{n}_{seed}.txt'
+        path.write_text('\n'.join(lines) + '\n')
+        return str(path)
+    return write
@@ -0,0 +1,38 @@
+'''Tests of the non-dominated solution filter'''
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from structure.dominance import get_nondominated_solutions, solution_is_dominant
+
+
+def all_pairs_nondominated(all_solutions: list) -> list:
+    '''Reference of `get_nondominated_solutions`: each solution is compared with every other one.
+
+    Args:
+      all_solutions (list): solutions with `of_MaxSum` and `of_MaxMin` attributes.
+
+    Returns:
+      (list of bool): whether each solution is non-dominated by any other solution in the list.
+    '''
+    is_non_dominated = [True] * len(all_solutions)
+    for i, sol_i in enumerate(all_solutions):
+        for j, sol_j in enumerate(all_solutions):
+            if i != j and solution_is_dominant(sol_j, sol_i):
+                is_non_dominated[i] = False
+                break
+    return is_non_dominated
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_sweep_matches_all_pairs(seed):
+    '''The filter agrees with the all-pairs comparison on lists with many ties and duplicates,
+    given as solutions and as arrays of objective values.'''
+    rng = np.random.default_rng(seed)
+    for size in [0, 1, 2, 5, 30, 200]:
+        values = rng.integers(0, 6, (size, 2)).astype(np.float64)
+        solutions = [SimpleNamespace(of_MaxSum=s, of_MaxMin=m) for s, m in values.tolist()]
+        expected = all_pairs_nondominated(solutions)
+        assert get_nondominated_solutions(solutions) == expected
+        assert get_nondominated_solutions(values) == expected
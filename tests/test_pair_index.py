@@ -0,0 +1,50 @@
+'''Tests of the PairIndex'''
+import numpy as np
+import pytest
+
+from structure import instance_cache, solution
+from structure.pair_index import PAIR_ARRAYS, PairIndex, get_pair_index, use_pair_index
+from structure.solution import Solution
+
+
+def test_position_finds_every_neighbour(write_instance):
+    '''The binary search finds each node in the neighbour list of every other node, also among
+    neighbours at the same distance.'''
+    instance = instance_cache.load_instance(write_instance(30, 0))
+    index = get_pair_index(instance)
+    n = instance['n']
+    nodes, targets = np.nonzero(~np.eye(n, dtype=bool))
+    positions = index.position(nodes, targets, instance['d'][nodes, targets])
+    np.testing.assert_array_equal(index.neighbours[nodes, positions], targets)
+
+
+def test_cached_index_is_shared(write_instance, tmp_path):
+    '''The index of a cached instance is stored in its entry and memory-mapped, with the same
+    arrays as an index built in memory.'''
+    path = write_instance(30, 1)
+    cache_dir = str(tmp_path / 'cache')
+    expected = PairIndex(instance_cache.load_instance(path))
+    for distances in ['Dense', 'Condensed', 'Dense']:  # The last one reads the stored index
+        index = get_pair_index(instance_cache.load_instance(path, cache_dir, distances))
+        for name in PAIR_ARRAYS:
+            assert isinstance(getattr(index, name), np.memmap)
+            np.testing.assert_array_equal(getattr(index, name), getattr(expected, name))
+
+
+@pytest.mark.parametrize('distances', ['Dense', 'Condensed'])
+@pytest.mark.parametrize('cached', [False, True])
+def test_index_only_when_shared_or_dense(write_instance, tmp_path, monkeypatch, distances,
+                                         cached):
+    '''The removals of a solution only build the index if it is memory-mapped from the cache or
+    the distance matrix is dense, and never for condensed distances without cache.'''
+    cache_dir = str(tmp_path / 'cache') if cached else None
+    instance = instance_cache.load_instance(write_instance(30, 2), cache_dir, distances)
+    monkeypatch.setattr(solution, 'SCAN_FACTOR', 0)  # Scan the neighbour lists if allowed
+    expected = cached or distances == 'Dense'
+    assert use_pair_index(instance) == expected
+
+    sol = Solution(instance)
+    for u in range(10):
+        sol.add_to_solution(u)
+    sol.remove_from_solution(0)
+    assert ('index' in instance) == expected
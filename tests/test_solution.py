@@ -0,0 +1,107 @@
+'''Tests of the incremental vectors of a Solution and its snapshots'''
+import copy
+import pickle
+
+import numpy as np
+import pytest
+
+from structure import instance_cache, solution
+from structure.solution import Solution
+
+
+def all_pairs_neighbours(instance: dict, selected: list):
+    '''Reference of the incremental vectors of a Solution: the sum of distances from every node to
+    the selected nodes, and its closest and second closest selected nodes (other than itself),
+    found by checking every selected node with ties broken by node ID.
+
+    Args:
+      instance (dict): contains the instance data.
+      selected (list): IDs of the selected nodes.
+
+    Returns:
+      (tuple): `sum_to`, `min_to`, `nearest`, `min2_to` and `second` vectors.
+    '''
+    n = instance['n']
+    d = instance['d']
+    sum_to = np.zeros(n)
+    min_to = np.full(n, 0x3f3f3f3f, dtype=np.float64)
+    nearest = np.full(n, -1, dtype=np.intp)
+    min2_to = np.full(n, 0x3f3f3f3f, dtype=np.float64)
+    second = np.full(n, -1, dtype=np.intp)
+    for u in range(n):
+        sum_to[u] = sum(float(d[u, s]) for s in selected)
+        others = sorted((float(d[u, s]), s) for s in selected if s != u)
+        if len(others) > 0:
+            min_to[u], nearest[u] = others[0]
+        if len(others) > 1:
+            min2_to[u], second[u] = others[1]
+    return sum_to, min_to, nearest, min2_to, second
+
+
+@pytest.mark.parametrize('distances', ['Dense', 'Condensed'])
+@pytest.mark.parametrize('cached', [False, True])
+@pytest.mark.parametrize('use_index', [False, True])
+@pytest.mark.parametrize('seed', range(4))
+def test_random_moves_keep_vectors(write_instance, tmp_path, monkeypatch, distances, cached,
+                                  use_index, seed):
+    '''After every addition or removal of a random sequence, the sums, the closest and second
+    closest selected nodes, and the MaxMin value of the solution match the all-pairs reference.'''
+    cache_dir = str(tmp_path / 'cache') if cached else None
+    instance = instance_cache.load_instance(write_instance(40, seed), cache_dir, distances)
+    # Scan the neighbour lists of the PairIndex in every removal (if the storage allows it), or
+    # never
+    monkeypatch.setattr(solution, 'SCAN_FACTOR', 0 if use_index else np.inf)
+
+    rng = np.random.default_rng(seed)
+    sol = Solution(instance)
+    target = instance['n'] - 2  # Size the solution grows to, then shrinks to
+    for _ in range(300):
+        size = len(sol.solution_set)
+        if size == 0 or (size < target and rng.random() < 0.8):
+            sol.add_to_solution(int(rng.choice(np.flatnonzero(~sol.selected))))
+        else:
+            sol.remove_from_solution(int(rng.choice(np.flatnonzero(sol.selected))))
+        if size == target:
+            target = int(rng.integers(0, instance['n'] - 1))
+
+        sum_to, min_to, nearest, min2_to, second = all_pairs_neighbours(
+            instance, sorted(sol.solution_set))
+        np.testing.assert_allclose(sol.sum_to, sum_to, atol=1e-6)
+        np.testing.assert_array_equal(sol.min_to, min_to)
+        np.testing.assert_array_equal(sol.nearest, nearest)
+        np.testing.assert_array_equal(sol.min2_to, min2_to)
+        np.testing.assert_array_equal(sol.second, second)
+        selected = np.flatnonzero(sol.selected)
+        assert sol.of_MaxMin == (min_to[selected].min() if len(selected) > 1 else 0x3f3f3f3f)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_snapshot_rebuilds_solution(write_instance, seed):
+    '''A snapshot is immutable, survives pickling without the instance, and rebuilds a solution
+    with the same vectors, values and hash, whose selected set iterates in the order of a deep
+    copy of the original one.'''
+    instance = instance_cache.load_instance(write_instance(30, seed))
+    rng = np.random.default_rng(seed)
+    sol = Solution(instance)
+    for u in rng.permutation(instance['n'])[:20].tolist():
+        sol.add_to_solution(u)
+    for u in rng.choice(sorted(sol.solution_set), 12, replace=False).tolist():
+        sol.remove_from_solution(u)
+
+    snapshot = sol.snapshot()
+    with pytest.raises(AttributeError):
+        snapshot.of_MaxSum = 0
+    assert not snapshot.nodes.flags.writeable
+    assert snapshot.solution_set == sol.solution_set
+
+    rebuilt = snapshot.to_solution()
+    assert list(rebuilt.solution_set) == list(copy.deepcopy(sol.solution_set))
+    for name in ['sum_to', 'min_to', 'nearest', 'min2_to', 'second']:
+        np.testing.assert_array_equal(getattr(rebuilt, name), getattr(sol, name))
+    for name in ['of_MaxSum', 'of_MaxMin', 'total_cost', 'total_capacity', 'hash_key']:
+        assert getattr(rebuilt, name) == getattr(sol, name)
+
+    received = pickle.loads(pickle.dumps(snapshot))
+    assert received.instance is None
+    np.testing.assert_array_equal(received.nodes, snapshot.nodes)
+    assert received.hash_key == snapshot.hash_key